@@ -0,0 +1,21 @@
+# تنظیمات gunicorn
+# هر اتصال SSE (/api/seller/stream و /api/customer/stream) تا بسته شدن یک thread را
+# نگه می‌دارد؛ با worker پیش‌فرض sync هر اتصال کل worker را اشغال می‌کند. با gthread
+# هر worker چندین اتصال همزمان را سرویس می‌دهد. برای رسیدن رویدادها به همه workerها
+# REDIS_URL را تنظیم کنید.
+import os
+
+workers = int(os.environ.get('GUNICORN_WORKERS', (os.cpu_count() or 1) + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 100))
+# اتصال‌های SSE طولانی هستند؛ heartbeat هر ۱۵ ثانیه ارسال می‌شود
+timeout = 60
+
+
+def post_worker_init(worker):
+    # کارهای دوره‌ای (بازیابی ورود PDF، پاکسازی اعلان‌ها، snapshot کمیسیون، خلاصه و
+    # نگهداری لاگ‌های مصرف) در هر worker شروع می‌شوند و قفل جدول periodic_task_leases
+    # هر اجرا را به یک worker می‌دهد. برای اجرای آن‌ها با cron به جای worker، interval
+    # هر کار را در app.py صفر کنید و دستورهای flask معادل را زمان‌بندی کنید.
+    from app import start_periodic_tasks
+    start_periodic_tasks()
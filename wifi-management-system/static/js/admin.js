@@ -95,8 +95,8 @@ document.getElementById('uploadForm').addEventListener('submit', function(e) {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            resultDiv.innerHTML = `<div class="alert-success">✅ ${data.accounts_count} اکانت با موفقیت استخراج شد!</div>`;
-            loadAccounts(); // بارگذاری مجدد لیست اکانت‌ها
+            resultDiv.innerHTML = '<div class="alert-info">⏳ فایل در صف پردازش قرار گرفت...</div>';
+            pollImportJob(data.job_id, resultDiv);
         } else {
             resultDiv.innerHTML = `<div class="alert-error">❌ خطا در آپلود فایل: ${data.message || 'خطای ناشناخته'}</div>`;
         }
@@ -107,6 +107,27 @@ document.getElementById('uploadForm').addEventListener('submit', function(e) {
     });
 });
 
+// پیگیری پیشرفت کار ورود PDF تا پایان پردازش
+function pollImportJob(jobId, resultDiv) {
+    fetch(`/api/admin/imports/${jobId}`)
+    .then(response => response.json())
+    .then(job => {
+        if (job.status === 'completed') {
+            resultDiv.innerHTML = `<div class="alert-success">✅ ${job.accounts_saved} اکانت با موفقیت استخراج شد!</div>`;
+            loadAccounts(); // بارگذاری مجدد لیست اکانت‌ها
+        } else if (job.status === 'failed') {
+            resultDiv.innerHTML = `<div class="alert-error">❌ خطا در پردازش فایل: ${job.error || 'خطای ناشناخته'}</div>`;
+        } else {
+            resultDiv.innerHTML = `<div class="alert-info">⏳ صفحه ${job.pages_done} از ${job.total_pages || '?'} - ${job.accounts_saved} اکانت ذخیره شد (${job.accounts_per_sec} اکانت در ثانیه)</div>`;
+            setTimeout(() => pollImportJob(jobId, resultDiv), 1000);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        resultDiv.innerHTML = '<div class="alert-error">❌ خطا در اتصال به سرور</div>';
+    });
+}
+
 // افزودن فروشنده جدید
 document.getElementById('addSellerForm').addEventListener('submit', function(e) {
     e.preventDefault();
@@ -172,23 +172,7 @@ function loadCustomerNotifications() {
             }
             
             notifications.forEach(notif => {
-                const alertClass = notif.type === 'urgent' ? 'urgent' : 
-                                 notif.type === 'success' ? 'success' : 'warning';
-                const alertIcon = notif.type === 'urgent' ? '🚨' : 
-                                notif.type === 'success' ? '✅' : '⚠️';
-                
-                const alertItem = `
-                    <div class="alert-item ${alertClass} ${notif.is_read ? 'read' : ''}" 
-                         onclick="markCustomerNotificationAsRead(${notif.id}, ${notif.user_notification_id})">
-                        <div class="alert-icon">${alertIcon}</div>
-                        <div class="alert-content">
-                            <h4>${notif.title}</h4>
-                            <p>${notif.message}</p>
-                            <div class="alert-time">${notif.created_at}</div>
-                        </div>
-                    </div>
-                `;
-                alertsList.innerHTML += alertItem;
+                alertsList.innerHTML += renderCustomerNotification(notif);
             });
         }
     })
@@ -197,6 +181,43 @@ function loadCustomerNotifications() {
     });
 }
 
+// HTML یک اعلان مشتری
+function renderCustomerNotification(notif) {
+    const alertClass = notif.type === 'urgent' ? 'urgent' : 
+                     notif.type === 'success' ? 'success' : 'warning';
+    const alertIcon = notif.type === 'urgent' ? '🚨' : 
+                    notif.type === 'success' ? '✅' : '⚠️';
+    
+    return `
+        <div class="alert-item ${alertClass} ${notif.is_read ? 'read' : ''}" 
+             onclick="markCustomerNotificationAsRead(${notif.id}, ${notif.user_notification_id})">
+            <div class="alert-icon">${alertIcon}</div>
+            <div class="alert-content">
+                <h4>${notif.title}</h4>
+                <p>${notif.message}</p>
+                <div class="alert-time">${notif.created_at}</div>
+            </div>
+        </div>
+    `;
+}
+
+// دریافت زنده اعلان‌ها و وضعیت اکانت از سرور (SSE) به جای polling
+function connectCustomerStream() {
+    const source = new EventSource('/api/customer/stream');
+    
+    source.addEventListener('status', event => {
+        updateUIWithRealData(JSON.parse(event.data));
+    });
+    
+    source.addEventListener('notification', event => {
+        const alertsList = document.getElementById('alerts-list');
+        if (!alertsList) return;
+        const empty = alertsList.querySelector('.no-notifications');
+        if (empty) empty.remove();
+        alertsList.insertAdjacentHTML('afterbegin', renderCustomerNotification(JSON.parse(event.data)));
+    });
+}
+
 // علامت‌گذاری اعلان مشتری به عنوان خوانده شده
 function markCustomerNotificationAsRead(notifId, userNotifId) {
     fetch(`/api/notifications/${notifId}/read`, {
@@ -295,16 +316,14 @@ async function loadRealData() {
 
 function updateUIWithRealData(data) {
     // به‌روزرسانی UI با داده‌های دریافتی از سرور
-    document.getElementById('remaining-data').textContent = data.remainingData;
-    document.getElementById('remaining-time').textContent = data.remainingTime;
-    document.getElementById('paid-amount').textContent = data.paidAmount;
+    document.getElementById('remaining-data').textContent = data.remaining_data;
+    document.getElementById('remaining-time').textContent = data.remaining_time;
+    document.getElementById('paid-amount').textContent = data.paid_amount;
+    document.getElementById('data-progress').style.width = `${data.data_percentage}%`;
+    document.getElementById('time-progress').style.width = `${data.time_percentage}%`;
 }
 
-setInterval(() => {
-    loadAccountStatus();
-    loadAlerts();
-}, 30000);
-
     // ... کدهای قبلی ...
     loadCustomerNotifications();
+    connectCustomerStream();
 });
\ No newline at end of file
@@ -256,23 +256,7 @@ function loadSellerNotifications() {
             }
             
             notifications.forEach(notif => {
-                const notifClass = `type-${notif.type}`;
-                const notifItem = `
-                    <div class="notification-item ${notifClass} ${notif.is_read ? 'read' : ''}" 
-                         onclick="markNotificationAsRead(${notif.id}, ${notif.user_notification_id})">
-                        <div class="notification-icon">
-                            ${notif.type === 'info' ? 'ℹ️' : 
-                              notif.type === 'warning' ? '⚠️' : 
-                              notif.type === 'urgent' ? '🚨' : '✅'}
-                        </div>
-                        <div class="notification-content">
-                            <h4>${notif.title}</h4>
-                            <p>${notif.message}</p>
-                            <div class="notification-time">${notif.created_at}</div>
-                        </div>
-                    </div>
-                `;
-                notificationsList.innerHTML += notifItem;
+                notificationsList.innerHTML += renderSellerNotification(notif);
             });
         }
     })
@@ -281,6 +265,51 @@ function loadSellerNotifications() {
     });
 }
 
+// HTML یک اعلان فروشنده
+function renderSellerNotification(notif) {
+    const notifClass = `type-${notif.type}`;
+    return `
+        <div class="notification-item ${notifClass} ${notif.is_read ? 'read' : ''}" 
+             onclick="markNotificationAsRead(${notif.id}, ${notif.user_notification_id})">
+            <div class="notification-icon">
+                ${notif.type === 'info' ? 'ℹ️' : 
+                  notif.type === 'warning' ? '⚠️' : 
+                  notif.type === 'urgent' ? '🚨' : '✅'}
+            </div>
+            <div class="notification-content">
+                <h4>${notif.title}</h4>
+                <p>${notif.message}</p>
+                <div class="notification-time">${notif.created_at}</div>
+            </div>
+        </div>
+    `;
+}
+
+// به‌روزرسانی کارت‌های داشبورد با آمار دریافتی از سرور
+function updateDashboardStats(stats) {
+    document.getElementById('available-accounts').textContent = stats.available_accounts;
+    document.getElementById('today-sales').textContent = stats.today_sales;
+    document.getElementById('commission-balance').textContent = stats.commission_balance.toLocaleString();
+    document.getElementById('total-sales-count').textContent = stats.total_sales;
+}
+
+// دریافت زنده اعلان‌ها و آمار از سرور (SSE) به جای بارگذاری مجدد
+function connectSellerStream() {
+    const source = new EventSource('/api/seller/stream');
+    
+    source.addEventListener('stats', event => {
+        updateDashboardStats(JSON.parse(event.data));
+    });
+    
+    source.addEventListener('notification', event => {
+        const notificationsList = document.getElementById('seller-notifications-list');
+        if (!notificationsList) return;
+        const empty = notificationsList.querySelector('.no-notifications');
+        if (empty) empty.remove();
+        notificationsList.insertAdjacentHTML('afterbegin', renderSellerNotification(JSON.parse(event.data)));
+    });
+}
+
 // علامت‌گذاری اعلان به عنوان خوانده شده
 function markNotificationAsRead(notifId, userNotifId) {
     fetch(`/api/notifications/${notifId}/read`, {
@@ -364,4 +393,5 @@ function filterAccounts() {
     console.log('Filtering accounts:', {type: typeFilter, search: searchFilter});
 }
     loadSellerNotifications();
+    connectSellerStream();
 });
\ No newline at end of file
@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+# دیتابیس و پوشه‌های uploads/archive آزمون‌ها در یک پوشه موقت، قبل از import شدن app
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='hams-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(WORKDIR, 'test.db')
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+import app as hams  # noqa: E402
+
+# تجاوز از سقف @query_budget در آزمون‌ها خطا است، نه فقط هشدار
+hams.app.config['QUERY_BUDGET_CHECKS'] = True
+
+
+@pytest.fixture
+def session():
+    """Session دیتابیس آزمون داخل app context؛ بعد از هر آزمون همه داده‌ها پاک می‌شوند"""
+    with hams.app.app_context():
+        yield hams.db.session
+        hams.db.session.rollback()
+        hams.usage_partitions.refresh(hams.db.session)
+        for _, table in hams.usage_partitions.partitions(hams.db.session):
+            hams.usage_partitions.drop(hams.db.session, table)
+        for table in reversed(hams.db.metadata.sorted_tables):
+            hams.db.session.execute(table.delete())
+        hams.db.session.commit()
+        hams.db.session.remove()
+    shutil.rmtree(hams.app.config['USAGE_ARCHIVE_FOLDER'], ignore_errors=True)
+
+
+def add_accounts(session, usernames, account_type='GB'):
+    """ساخت اکانت‌های آزاد؛ خروجی: لیست Account"""
+    accounts = [hams.Account(username=name, password='p', account_type=account_type) for name in usernames]
+    session.add_all(accounts)
+    session.commit()
+    return accounts
+
+
+def add_customers(session, accounts):
+    """یک مشتری برای هر اکانت؛ خروجی: لیست Customer"""
+    customers = [
+        hams.Customer(name=f'customer {account.id}', phone=f'0912{account.id:07d}', account_id=account.id)
+        for account in accounts
+    ]
+    session.add_all(customers)
+    session.commit()
+    return customers
+
+
+def add_usage(session, account_ids, dates, hours, values):
+    """درج لاگ‌های مصرف (ستون به ستون) در پارتیشن‌های ماهانه"""
+    now = datetime.utcnow()
+    groups = {}
+    for account_id, day, hour, value in zip(account_ids, dates, hours, values):
+        row = {
+            'account_id': int(account_id), 'data_used': float(value), 'time_used': 1,
+            'hour_of_day': int(hour), 'date': day, 'created_at': now
+        }
+        groups.setdefault(hams.usage_partitions.table_for(session, day), []).append(row)
+    for table, rows in groups.items():
+        session.execute(insert(table), rows)
+    session.commit()
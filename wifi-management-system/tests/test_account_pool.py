@@ -0,0 +1,44 @@
+import pytest
+
+import app as hams
+from conftest import add_accounts
+from utils.account_pool import AccountReservationPool, ClaimContentionError
+
+
+def test_claim_takes_each_account_once(session):
+    accounts = add_accounts(session, ['v1', 'v2', 'v3'])
+    pool = AccountReservationPool(hams.Account.__table__, refill_size=2)
+
+    claimed = [pool.claim(session, 'GB', None) for _ in accounts]
+    session.commit()
+
+    assert sorted(account_id for account_id, _ in claimed) == [account.id for account in accounts]
+    assert pool.claim(session, 'GB', None) is None
+
+
+def test_stale_refills_stop_after_max_refills(session, monkeypatch):
+    add_accounts(session, ['v1', 'v2'])
+    pool = AccountReservationPool(hams.Account.__table__, refill_size=2, max_refills=3)
+    refill, refills = pool._refill, []
+
+    def counted_refill(*args):
+        refills.append(1)
+        return refill(*args)
+
+    # مثل snapshot کهنه REPEATABLE READ: هر بار همان اکانت‌هایی که دیگران فروخته‌اند
+    monkeypatch.setattr(pool, '_claim', lambda *args: False)
+    monkeypatch.setattr(pool, '_refill', counted_refill)
+
+    with pytest.raises(ClaimContentionError):
+        pool.claim(session, 'GB', None)
+    assert len(refills) == 3
+
+
+def test_sale_reports_contention_as_conflict(session, monkeypatch):
+    add_accounts(session, ['v1'])
+    monkeypatch.setattr(hams.account_pool, '_claim', lambda *args: False)
+
+    response = hams.app.test_client().post('/api/sales', json={'seller_id': 1, 'account_type': 'GB', 'amount': 1000})
+
+    assert response.status_code == 409
+    assert not response.get_json()['success']
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from conftest import add_accounts, add_customers, add_usage
+from utils.ai_predictor import AIPredictor, cyclic_features, weekdays
+
+
+@pytest.fixture
+def customers(session):
+    """چهار مشتری با ۲۰ روز لاگ ساعتی با الگوی روزانه متفاوت"""
+    accounts = add_accounts(session, ['a', 'b', 'c', 'd'])
+    customers = add_customers(session, accounts)
+    rng = np.random.default_rng(0)
+    today = datetime.now().date()
+    account_ids, dates, hours, values = [], [], [], []
+    for index, account in enumerate(accounts):
+        for back in range(1, 21):
+            for hour in range(24):
+                account_ids.append(account.id)
+                dates.append(today - timedelta(days=back))
+                hours.append(hour)
+                values.append(10 * (index + 1) + 5 * np.sin(hour / 24 * 2 * np.pi) + rng.normal(0, 1))
+    add_usage(session, account_ids, dates, hours, values)
+    return [customer.id for customer in customers]
+
+
+def test_predict_horizon_matches_per_customer_models(customers):
+    predictor = AIPredictor(mode='customer')
+    day = np.datetime64(datetime.now().date())
+    hours = np.arange(24)
+    ids = np.array(customers)
+
+    batch = predictor.predict_horizon(ids[:, None], day, hours)
+
+    assert batch.shape == (len(ids), 24)
+    X = cyclic_features(weekdays(np.full(24, day)), hours)
+    for row, customer_id in enumerate(customers):
+        key = f'lr_{customer_id}'
+        expected = predictor.models[key].predict(predictor.scalers[key].transform(X))
+        np.testing.assert_allclose(batch[row], np.maximum(expected, 0))
+
+
+@pytest.mark.parametrize('mode', ['customer', 'global'])
+def test_predict_horizon_matches_single_calls(customers, mode):
+    predictor = AIPredictor(mode=mode)
+    ids = np.array(customers + [-1])
+    dates = np.datetime64(datetime.now().date()) + np.arange(3)
+    hours = np.array([0, 7, 19])
+
+    batch = predictor.predict_horizon(ids[:, None, None], dates[None, :, None], hours[None, None, :])
+
+    assert batch.shape == (len(ids), 3, 3)
+    for i, customer_id in enumerate(ids.tolist()):
+        for j, day in enumerate(dates):
+            for k, hour in enumerate(hours.tolist()):
+                single = predictor.predict_horizon(customer_id, day, hour)[()]
+                np.testing.assert_allclose(batch[i, j, k], single)
+    # مشتری ناموجود
+    assert np.isnan(batch[-1]).all()
+
+
+def test_daily_consumption_is_sum_of_hours(customers):
+    predictor = AIPredictor(mode='global')
+    today = datetime.now().date()
+    daily = predictor.predict_daily_consumption(customers, today)
+    hourly = predictor.predict_horizon(np.array(customers)[:, None], today, np.arange(24))
+    np.testing.assert_allclose(daily, hourly.sum(axis=1))
+
+
+def test_failing_customer_model_only_affects_its_rows(customers, monkeypatch):
+    predictor = AIPredictor(mode='customer')
+    model_key = predictor._model_key
+
+    def broken(customer_id, model_type):
+        if customer_id == customers[1]:
+            raise RuntimeError('training failed')
+        return model_key(customer_id, model_type)
+
+    monkeypatch.setattr(predictor, '_model_key', broken)
+    daily = predictor.predict_daily_consumption(customers)
+
+    assert np.isnan(daily[1])
+    assert np.isfinite(np.delete(daily, 1)).all()
+
+
+def test_global_training_features_leave_each_row_out(customers):
+    predictor = AIPredictor(mode='global')
+    X, y, features = predictor.prepare_global_data(days_back=30, chunk_size=3)
+
+    assert len(y) == len(customers) * 20 * 24
+    # ستون میانگین ساعتی (اندیس ۴) میانگین ۱۹ ردیف دیگر همان خانه است، نه هر ۲۰ ردیف
+    full = (X[:, 4] * 19 + y) / 20
+    assert np.isclose(full[:, None], features['hourly'].ravel()[None, :]).any(axis=1).all()
+
+    sampled, y_sampled, _ = predictor.prepare_global_data(days_back=30, sample_size=500, chunk_size=1)
+    assert sampled.shape == (500, X.shape[1])
+    assert np.isin(y_sampled, y).all()
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+import app as hams
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_ledger_head_points_at_last_entry(session, monkeypatch, returning):
+    if not returning:
+        # مثل MySQL: بدون INSERT ... RETURNING
+        monkeypatch.setattr(hams.db.engine.dialect, 'insert_executemany_returning_sort_by_parameter_order', False)
+    seller = hams.Seller(name='seller', phone='09120000000', email='seller@example.com')
+    seller.set_password('secret')
+    session.add(seller)
+    session.commit()
+    ledger, entries = hams.commission_ledger, hams.CommissionLedgerEntry.__table__
+
+    assert ledger.earn(session, seller.id, [(1, 100), (2, 250), (3, 50)]) == 400
+    assert ledger.earn(session, seller.id, [(4, 10)]) == 410
+    ledger.withdraw(session, seller.id, 300, 1)
+    session.commit()
+
+    head = session.get(hams.CommissionBalance, seller.id)
+    assert head.balance == 110
+    assert head.last_entry_id == session.execute(select(func.max(entries.c.id))).scalar()
+    assert ledger.verify(session, seller.id) == []
+    assert ledger.balance_at(session, seller.id, datetime.utcnow()) == 110
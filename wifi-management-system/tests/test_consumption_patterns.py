@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import app as hams
+from conftest import add_accounts, add_customers, add_usage
+from utils.consumption_patterns import weekday_index
+
+
+def observations(accounts, size=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    account_ids = rng.choice([account.id for account in accounts], size)
+    dates = np.datetime64('2024-01-01') + rng.integers(0, 60, size)
+    hours = rng.integers(0, 24, size)
+    values = rng.gamma(2.0, 20.0, size)
+    return account_ids, dates, hours, values
+
+
+def expected_grid(account_ids, dates, hours, values, account_id):
+    """آمار هر خانه ۷×۲۴ یک اکانت که مستقیم با NumPy حساب شده"""
+    mine = account_ids == account_id
+    days, hours, values = weekday_index(dates[mine]), hours[mine], values[mine]
+    grid = {name: np.zeros((7, 24)) for name in ('average', 'peak', 'frequency', 'stddev')}
+    for day in range(7):
+        for hour in range(24):
+            cell = values[(days == day) & (hours == hour)]
+            if len(cell):
+                grid['average'][day, hour] = cell.mean()
+                grid['peak'][day, hour] = cell.max()
+                grid['frequency'][day, hour] = len(cell)
+                grid['stddev'][day, hour] = cell.std(ddof=1) if len(cell) > 1 else 0
+    return grid
+
+
+def assert_grid(actual, expected):
+    for name in expected:
+        np.testing.assert_allclose(actual[name], expected[name], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+def test_incremental_merge_matches_single_pass(session):
+    accounts = add_accounts(session, ['a', 'b', 'c'])
+    customers = add_customers(session, accounts)
+    account_ids, dates, hours, values = observations(accounts)
+
+    # چند دسته با اندازه‌های نابرابر، مثل chunkهای ورود لاگ
+    for part in np.array_split(np.arange(len(values)), [100, 1500, 1501]):
+        hams.consumption_patterns.observe(
+            session, account_ids[part], dates[part], hours[part].tolist(), values[part]
+        )
+    session.commit()
+
+    for account, customer in zip(accounts, customers):
+        assert_grid(
+            hams.consumption_patterns.pattern(session, customer.id),
+            expected_grid(account_ids, dates, hours, values, account.id)
+        )
+
+
+def test_rebuild_matches_incremental(session):
+    accounts = add_accounts(session, ['a', 'b', 'c', 'd'])
+    customers = add_customers(session, accounts)
+    account_ids, dates, hours, values = observations(accounts, size=2000, seed=1)
+    add_usage(session, account_ids, dates.astype(object), hours, values)
+    hams.consumption_patterns.observe(session, account_ids, dates, hours.tolist(), values)
+    session.commit()
+    incremental = [hams.consumption_patterns.pattern(session, customer.id) for customer in customers]
+
+    hams.app.config['PATTERN_REBUILD_BATCH_SIZE'], batch_size = 3, hams.app.config['PATTERN_REBUILD_BATCH_SIZE']
+    try:
+        assert hams.rebuild_consumption_patterns() == len(customers)
+    finally:
+        hams.app.config['PATTERN_REBUILD_BATCH_SIZE'] = batch_size
+
+    for customer, expected in zip(customers, incremental):
+        assert_grid(hams.consumption_patterns.pattern(session, customer.id), expected)
+
+
+def test_unknown_hours_are_ignored(session):
+    accounts = add_accounts(session, ['a'])
+    customer, = add_customers(session, accounts)
+    cells = hams.consumption_patterns.observe(
+        session, [accounts[0].id] * 2, np.array(['2024-01-01'] * 2, dtype='datetime64[D]'), [None, 5], [10.0, 20.0]
+    )
+    session.commit()
+
+    assert cells == 1
+    assert hams.consumption_patterns.pattern(session, customer.id)['frequency'].sum() == pytest.approx(1)
@@ -0,0 +1,18 @@
+from datetime import date, timedelta
+
+import app as hams
+from conftest import add_usage
+from utils.database_optimizer import db_optimizer
+
+
+def test_cleanup_old_data_applies_usage_retention(session):
+    today = date.today()
+    old, recent = today - timedelta(days=hams.app.config['USAGE_LOG_RETENTION_DAYS'] + 60), today - timedelta(days=10)
+    add_usage(session, [1, 1], [old, recent], [0, 0], [5.0, 7.0])
+    old_table = hams.usage_partitions.table_for(session, old).name
+
+    db_optimizer.cleanup_old_data()
+
+    names = [table.name for _, table in hams.usage_partitions.partitions(session)]
+    assert old_table not in names
+    assert hams.usage_partitions.table_for(session, recent).name in names
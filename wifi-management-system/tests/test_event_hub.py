@@ -0,0 +1,14 @@
+import app as hams
+from conftest import add_accounts
+
+
+def test_event_stream_benchmark_delivers_to_every_client(session):
+    add_accounts(session, ['v1'])
+
+    result = hams.app.test_cli_runner().invoke(args=['benchmark-event-stream', '--clients', '50', '--events', '3'])
+
+    assert result.exit_code == 0, result.output
+    lines = dict(line.split(': ') for line in result.output.splitlines())
+    assert lines['push_deliveries'] == '150'
+    assert lines['push_queries'] == '0'
+    assert lines['open_streams_after'] == '0'
@@ -0,0 +1,77 @@
+import pytest
+
+from utils.pdf_extractor import PDFExtractor, extract_page_range
+
+TYPES = [('5GB', 'GB'), ('500MB', 'MB'), ('high 10', 'Wfi')]
+
+
+def voucher_lines(page):
+    return [f'User: v{page:02d}{i} Pass: p{page:02d}{i} {TYPES[i][0]}' for i in range(len(TYPES))]
+
+
+def expected_accounts(pages):
+    return [
+        {'username': f'v{page:02d}{i}', 'password': f'p{page:02d}{i}', 'account_type': account_type, 'status': 'active'}
+        for page in pages for i, (_, account_type) in enumerate(TYPES)
+    ]
+
+
+def write_pdf(path, pages):
+    """ساخت یک PDF ساده با فونت Helvetica؛ هر صفحه یک لیست خط متن"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for lines in pages:
+        text = ' '.join(f'({line}) Tj 0 -20 Td' for line in lines)
+        stream = f'BT /F1 12 Tf 50 750 Td {text} ET'.encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> '
+            b'/Contents %d 0 R >>' % len(objects)
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    body, offsets = b'%PDF-1.4\n', []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(body)
+    body += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    body += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    body += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    path.write_bytes(body)
+    return str(path)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return write_pdf(tmp_path / 'vouchers.pdf', [voucher_lines(page) for page in range(11)])
+
+
+@pytest.fixture
+def extractor():
+    # بیش از max_workers * 2 بازه تا صف محدود وظایف در استخر هم اجرا شود
+    extractor = PDFExtractor(max_workers=2, pages_per_task=2)
+    yield extractor
+    extractor.shutdown()
+
+
+def test_extract_page_range_reads_only_its_pages(pdf_path):
+    assert extract_page_range(pdf_path, 3, 5) == expected_accounts([3, 4])
+
+
+def test_pool_returns_ranges_in_page_order(extractor, pdf_path):
+    results = list(extractor.iter_ranges(pdf_path))
+
+    assert extractor._pool is not None
+    assert [page_range for page_range, _ in results] == [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10), (10, 11)]
+    for (start, end), accounts in results:
+        assert accounts == expected_accounts(range(start, end))
+    assert extractor.extract(pdf_path) == expected_accounts(range(11))
+
+
+def test_resume_from_start_page(extractor, pdf_path):
+    results = list(extractor.iter_ranges(pdf_path, start_page=5))
+
+    assert [page_range for page_range, _ in results] == [(5, 7), (7, 9), (9, 11)]
+    assert [account for _, accounts in results for account in accounts] == expected_accounts(range(5, 11))
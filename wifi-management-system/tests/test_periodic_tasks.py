@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import app as hams
+from utils.background_jobs import TaskLease
+
+
+def test_lease_runs_each_period_in_one_process(session, monkeypatch):
+    holder = {'name': 'host:1'}
+    monkeypatch.setattr(TaskLease, 'holder', staticmethod(lambda: holder['name']))
+
+    assert hams.acquire_task_lease('usage-rollup', 60)
+    holder['name'] = 'host:2'
+    assert not hams.acquire_task_lease('usage-rollup', 60)
+    # کارهای دیگر قفل جدای خودشان را دارند
+    assert hams.acquire_task_lease('notification-sweeper', 60)
+    holder['name'] = 'host:1'
+    assert hams.acquire_task_lease('usage-rollup', 60)
+
+    # صاحب قفل از بین رفته؛ بعد از انقضا پروسس دیگری آن را برمی‌دارد
+    lease = session.get(hams.PeriodicTaskLease, 'usage-rollup')
+    lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.commit()
+    holder['name'] = 'host:2'
+    assert hams.acquire_task_lease('usage-rollup', 60)
+    assert session.get(hams.PeriodicTaskLease, 'usage-rollup', populate_existing=True).holder == 'host:2'
+
+
+def test_periodic_task_runs_only_with_lease(session):
+    calls, grants = [], iter([True])
+    task = hams.PeriodicTask(
+        hams.app, lambda: calls.append(1), 0.01, name='test-task', lease=lambda name, seconds: next(grants, False)
+    )
+    task.start()
+    task._thread.join(0.1)
+    task.stop()
+    task._thread.join()
+
+    assert calls == [1]
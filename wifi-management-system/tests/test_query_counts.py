@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as hams
+from conftest import add_accounts
+from utils.query_counter import assert_max_queries
+
+# endpointهای لیست با تعداد ثابت کوئری، مستقل از تعداد ردیف‌ها
+SIZES = [1, 20]
+
+
+def add_sales(session, count):
+    """فروش‌های فروشنده ۱ (کاربر موقت endpointها) و دو فروشنده دیگر"""
+    sellers = [hams.Seller(id=i, name=f'seller {i}', phone=f'0912000000{i}', email=f's{i}@example.com') for i in (1, 2, 3)]
+    for seller in sellers:
+        seller.set_password('secret')
+    session.add_all(sellers)
+    accounts = add_accounts(session, [f'v{i}' for i in range(count * 3)])
+    now = datetime.utcnow()
+    session.add_all([
+        hams.Transaction(seller_id=sellers[i % 3].id, account_id=account.id, amount=1000, commission=100,
+                         created_at=now - timedelta(minutes=i))
+        for i, account in enumerate(accounts)
+    ])
+    session.commit()
+
+
+def add_notifications(session, count):
+    """اعلان‌های همگانی (بعضی خوانده شده)، گروهی و مستقیم برای فروشنده ۱ و مشتری ۱"""
+    for i in range(count):
+        broadcast = hams.Notification(title=f'all {i}', message='m', target_type='all')
+        sellers = hams.Notification(title=f'sellers {i}', message='m', target_type='sellers')
+        direct = hams.Notification(title=f'direct {i}', message='m', target_type='specific_user', target_id=1)
+        session.add_all([broadcast, sellers, direct])
+        session.flush()
+        session.add_all([
+            hams.UserNotification(user_type='seller', user_id=1, notification_id=sellers.id),
+            hams.UserNotification(user_type='customer', user_id=1, notification_id=direct.id),
+        ])
+        if i % 2:
+            session.add(hams.UserNotification(user_type='seller', user_id=1, notification_id=broadcast.id, is_read=True))
+    session.commit()
+
+
+def count_queries(path):
+    with assert_max_queries(hams.db.engine, 1) as counter:
+        response = hams.app.test_client().get(path)
+    assert response.status_code == 200
+    return counter.count, response.get_json()
+
+
+@pytest.mark.parametrize('count', SIZES)
+def test_seller_sales_use_one_query(session, count):
+    add_sales(session, count)
+
+    queries, body = count_queries('/api/seller/sales?limit=100')
+
+    assert queries == 1
+    assert len(body['sales']) == count
+
+
+@pytest.mark.parametrize('count', SIZES)
+def test_inbox_endpoints_use_one_query(session, count):
+    add_notifications(session, count)
+
+    queries, seller = count_queries('/api/seller/notifications')
+    assert queries == 1
+    assert len(seller) == count * 2
+
+    queries, customer = count_queries('/api/customer/notifications')
+    assert queries == 1
+    assert len(customer) == count * 2
+
+    queries, unread = count_queries('/api/notifications/unread-count?user_type=seller&user_id=1')
+    assert queries == 1
+    assert unread['unread'] == count * 2 - count // 2
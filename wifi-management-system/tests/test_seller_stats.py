@@ -0,0 +1,75 @@
+import pytest
+
+import app as hams
+from conftest import add_accounts
+
+
+def add_seller(session):
+    seller = hams.Seller(name='seller', phone='09120000000', email='seller@example.com')
+    seller.set_password('secret')
+    session.add(seller)
+    session.commit()
+    return seller
+
+
+def rebuilt_stats(session, seller_id):
+    """آمار فروشنده محاسبه شده از جداول اصلی برای مقایسه با مقادیر افزایشی"""
+    session.execute(hams.SellerStats.__table__.delete())
+    return hams.seller_stats.get(session, seller_id)
+
+
+def test_first_sale_without_stats_row_is_counted_once(session):
+    seller = add_seller(session)
+    account, _ = add_accounts(session, ['v1', 'v2'])
+    assert session.get(hams.SellerStats, seller.id) is None
+
+    response = hams.app.test_client().post('/api/sales', json={
+        'seller_id': seller.id, 'account_id': account.id, 'amount': 1000
+    })
+    assert response.get_json()['success']
+
+    stats = hams.seller_stats.get(session, seller.id)
+    assert stats['total_sales'] == 1
+    assert stats['today_sales'] == 1
+    assert stats == rebuilt_stats(session, seller.id)
+
+
+def test_first_batch_sale_without_stats_row_is_counted_once(session):
+    seller = add_seller(session)
+    accounts = add_accounts(session, ['v1', 'v2', 'v3'])
+
+    response = hams.app.test_client().post('/api/sales/batch', json={
+        'seller_id': seller.id,
+        'items': [{'account_id': account.id, 'amount': 500} for account in accounts[:2]]
+    })
+    assert response.get_json()['sold'] == 2
+
+    stats = hams.seller_stats.get(session, seller.id)
+    assert stats['total_sales'] == 2
+    assert stats == rebuilt_stats(session, seller.id)
+
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_batch_sale_results(session, monkeypatch, returning):
+    if not returning:
+        # مثل MySQL: بدون UPDATE/INSERT ... RETURNING
+        dialect = hams.db.engine.dialect
+        monkeypatch.setattr(dialect, 'update_returning', False)
+        monkeypatch.setattr(dialect, 'insert_executemany_returning_sort_by_parameter_order', False)
+    seller = add_seller(session)
+    first, second, sold = add_accounts(session, ['v1', 'v2', 'v3'])
+    sold.status = 'sold'
+    session.commit()
+
+    response = hams.app.test_client().post('/api/sales/batch', json={
+        'seller_id': seller.id,
+        'items': [{'account_id': account.id, 'amount': 1000} for account in (second, sold, first)]
+    })
+    results = response.get_json()['results']
+
+    assert [result['success'] for result in results] == [True, False, True]
+    for result in (results[0], results[2]):
+        transaction = session.get(hams.Transaction, result['transaction_id'])
+        assert transaction.account_id == result['account_id']
+        assert session.query(hams.Commission).filter_by(transaction_id=transaction.id).one().amount == 100
+    assert hams.seller_stats.get(session, seller.id)['total_sales'] == 2
@@ -0,0 +1,94 @@
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import func, insert, select
+
+import app as hams
+from conftest import add_usage
+
+START, END = date(2024, 1, 1), date(2024, 12, 31)
+CUTOFF = date(2024, 6, 1)
+
+
+def add_old_logs(session):
+    """لاگ‌های دو پارتیشن ماهانه و چند ردیف قدیمی جدول اصلی usage_logs"""
+    rng = np.random.default_rng(0)
+    days = np.datetime64('2024-01-01') + rng.integers(0, 60, 500)
+    add_usage(session, rng.integers(1, 6, 500), days.astype(object), rng.integers(0, 24, 500), rng.random(500) * 100)
+    session.execute(insert(hams.UsageLog.__table__), [
+        {'account_id': 1 + i % 3, 'data_used': float(i), 'time_used': 1, 'hour_of_day': i % 24,
+         'date': date(2024, 3 + i % 2, 1 + i % 28), 'created_at': datetime.utcnow()}
+        for i in range(35)
+    ])
+    session.commit()
+
+
+def totals(session):
+    return hams.usage_reader.sum(session, START, END, by=('account_id', 'date'))
+
+
+def test_archive_round_trip(session):
+    add_old_logs(session)
+    before = totals(session)
+
+    archived, rows = hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+
+    assert sorted(archived) == ['usage_logs_202401', 'usage_logs_202402']
+    assert rows == 535
+    assert hams.usage_partitions.partitions(session) == []
+    assert session.execute(select(func.count()).select_from(hams.UsageLog.__table__)).scalar() == 0
+    assert totals(session) == pytest.approx(before)
+
+
+def test_archive_rerun_after_crash_before_drop(session, monkeypatch):
+    add_old_logs(session)
+    before = totals(session)
+
+    def crash(*args):
+        raise RuntimeError('crash after writing the archive file')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hams.usage_partitions, 'drop', crash)
+        with pytest.raises(RuntimeError):
+            hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+    session.rollback()
+
+    hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+    hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+    assert totals(session) == pytest.approx(before)
+
+
+def test_archive_rerun_after_crash_between_template_batches(session, monkeypatch):
+    add_old_logs(session)
+    before = totals(session)
+    write = hams.usage_archive.write
+    sources = []
+
+    def flaky_write(month, arrays, source):
+        count = write(month, arrays, source)
+        sources.append(source)
+        if source.startswith('usage_logs-') and len(set(sources) - {'usage_logs_202401', 'usage_logs_202402'}) == 2:
+            raise RuntimeError('crash before deleting the batch')
+        return count
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hams.usage_archive, 'write', flaky_write)
+        with pytest.raises(RuntimeError):
+            hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+    session.rollback()
+
+    hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+    assert totals(session) == pytest.approx(before)
+
+
+def test_drop_before_removes_every_source_file(session):
+    add_old_logs(session)
+    hams.usage_archive.archive(session, hams.usage_partitions, CUTOFF, batch_size=10)
+
+    dropped = hams.usage_archive.drop_before(date(2024, 3, 1))
+
+    assert dropped and all(name.startswith(('usage_logs_202401', 'usage_logs_202402')) for name in dropped)
+    assert hams.usage_archive.months() == [date(2024, 3, 1), date(2024, 4, 1)]
+    assert not any(name in os.listdir(hams.usage_archive.directory) for name in dropped)
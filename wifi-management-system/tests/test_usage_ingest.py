@@ -0,0 +1,39 @@
+import io
+import json
+from datetime import date
+
+import app as hams
+from conftest import add_accounts
+from utils.usage_ingest import UsageLogParser
+
+
+def logged_accounts(session):
+    usage = hams.usage_reader.columns(session, date(2024, 1, 1), date(2024, 1, 31), ['account_id'])
+    return sorted(usage['account_id'].tolist())
+
+
+def test_numeric_usernames_are_not_taken_as_ids(session):
+    # نام کاربری ووچر اول عدد id ووچر دوم است
+    first, second = add_accounts(session, ['placeholder', 'x'])
+    first.username = str(second.id)
+    session.commit()
+
+    body = f'username,data_used,time_used,timestamp\n{second.id},10,5,2024-01-02 10:00\nx,20,5,2024-01-02 11:00\n'
+    stats = hams.ingest_usage_logs(io.BytesIO(body.encode('utf-8')), 'csv')
+
+    assert stats['rejected'] == 0
+    assert logged_accounts(session) == [first.id, second.id]
+
+
+def test_account_id_column_is_parsed_as_id(session):
+    first, second = add_accounts(session, ['a', 'b'])
+    lines = [
+        {'account_id': second.id, 'data_used': 1, 'time_used': 1, 'timestamp': '2024-01-03T08:00:00'},
+        {'account': 'a', 'data_used': 1, 'time_used': 1, 'timestamp': '2024-01-03T09:00:00'},
+        {'account_id': 'b', 'data_used': 1, 'time_used': 1, 'timestamp': '2024-01-03T09:00:00'},
+    ]
+    parser = UsageLogParser(session, hams.Account.__table__)
+    rows = list(parser.parse(io.StringIO('\n'.join(json.dumps(line) for line in lines)), 'ndjson'))
+
+    assert [row[0] for row in rows] == [second.id, first.id]
+    assert parser.rejected == 1
@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+
+class ClaimContentionError(RuntimeError):
+    """اکانت‌های صف پشت سر هم توسط تراکنش‌های دیگر فروخته شدند؛ در تراکنش جدید دوباره تلاش کنید"""
+
+
+class AccountReservationPool:
+    """صف اکانت‌های آماده فروش هر account_type در حافظه همین پروسس
+
+    شناسه‌ها به صورت دسته‌ای از دیتابیس بارگذاری می‌شوند و گرفتن هر اکانت با یک
+    UPDATE شرطی (WHERE status='active') انجام می‌شود؛ اگر پروسس یا thread دیگری
+    زودتر آن را فروخته باشد UPDATE هیچ ردیفی را تغییر نمی‌دهد و اکانت بعدی صف
+    امتحان می‌شود. قفل فقط برای پر کردن صف هر نوع است، نه برای فروش.
+
+    تعداد پر کردن‌های صف در یک claim محدود به max_refills است: در REPEATABLE READ
+    (InnoDB) هر SELECT پر کردن همان snapshot ابتدای تراکنش را می‌بیند و ممکن است
+    مدام اکانت‌هایی را برگرداند که تراکنش‌های دیگر فروخته‌اند.
+    """
+
+    def __init__(self, accounts, refill_size=200, max_refills=3):
+        self.accounts = accounts
+        self.refill_size = refill_size
+        self.max_refills = max(1, max_refills)
+        self._queues = defaultdict(deque)
+        self._cursors = defaultdict(int)
+        self._locks = defaultdict(threading.Lock)
+
+    def _refill(self, session, account_type):
+        """بارگذاری دسته بعدی اکانت‌های فعال این نوع؛ خروجی: تعداد بارگذاری شده"""
+        accounts = self.accounts
+        with self._locks[account_type]:
+            queue = self._queues[account_type]
+            if queue:
+                # thread دیگری همین الان صف را پر کرده است
+                return len(queue)
+
+            for _ in range(2):
+                cursor = self._cursors[account_type]
+                rows = session.execute(
+                    select(accounts.c.id, accounts.c.seller_id)
+                    .where(
+                        accounts.c.account_type == account_type,
+                        accounts.c.status == 'active',
+                        accounts.c.id > cursor
+                    )
+                    .order_by(accounts.c.id)
+                    .limit(self.refill_size)
+                ).all()
+                # بعد از رسیدن به انتهای جدول، دسته بعدی دوباره از ابتدا خوانده می‌شود
+                self._cursors[account_type] = rows[-1].id if len(rows) == self.refill_size else 0
+                if rows or cursor == 0:
+                    break
+
+            # ترتیب تصادفی تا پروسس‌های مختلف کمتر سراغ یک اکانت بروند
+            batch = [tuple(row) for row in rows]
+            random.shuffle(batch)
+            queue.extend(batch)
+            return len(batch)
+
+    def _claim(self, session, account_id, previous_seller, seller_id):
+        accounts = self.accounts
+        result = session.execute(
+            update(accounts)
+            .where(
+                accounts.c.id == account_id,
+                accounts.c.status == 'active',
+                accounts.c.seller_id.is_not_distinct_from(previous_seller)
+            )
+            .values(status='sold', seller_id=seller_id)
+        )
+        return result.rowcount == 1
+
+    def claim(self, session, account_type, seller_id):
+        """گرفتن یک اکانت آزاد از این نوع برای فروشنده
+
+        خروجی: (account_id، seller_id قبلی) یا None اگر اکانت فعالی نمانده باشد.
+        اگر بعد از max_refills بار پر کردن صف هیچ اکانتی گرفته نشود ClaimContentionError
+        داده می‌شود. commit به عهده فراخواننده است.
+        """
+        queue = self._queues[account_type]
+        refills = 0
+        while True:
+            try:
+                account_id, previous_seller = queue.popleft()
+            except IndexError:
+                if refills == self.max_refills:
+                    raise ClaimContentionError(account_type)
+                if not self._refill(session, account_type):
+                    return None
+                refills += 1
+                continue
+            if self._claim(session, account_id, previous_seller, seller_id):
+                return account_id, previous_seller
+
+    def claim_account(self, session, account_id, seller_id):
+        """گرفتن یک اکانت مشخص؛ خروجی: seller_id قبلی یا False اگر اکانت فعال نباشد"""
+        accounts = self.accounts
+        row = session.execute(
+            select(accounts.c.seller_id, accounts.c.status).where(accounts.c.id == account_id)
+        ).first()
+        if row is None or row.status != 'active':
+            return False
+        if not self._claim(session, account_id, row.seller_id, seller_id):
+            return False
+        return row.seller_id
+
+    def available(self, account_type):
+        """تعداد شناسه‌های در صف این پروسس (فقط برای پایش)"""
+        return len(self._queues[account_type])
+
+
+def benchmark_concurrent_claims(app, accounts, threads=16, sales_per_thread=50, workers=4, refill_size=50):
+    """فروش همزمان با threads thread و workers استخر جدا (شبیه چند پروسس)
+
+    روی اکانت‌های موقت یک نوع اختصاصی اجرا و بعد پاک می‌شود. حالت naive همان
+    الگوی قبلی است (خواندن اکانت فعال و سپس UPDATE بدون شرط) برای مقایسه.
+    خروجی: تعداد فروش، تعداد فروش تکراری یک اکانت و سرعت برای هر حالت
+    """
+    db = app.extensions['sqlalchemy']
+    account_type = f'bench-{uuid.uuid4().hex[:8]}'
+    total = threads * sales_per_thread
+
+    def run(mode):
+        now = datetime.utcnow()
+        with app.app_context():
+            db.session.execute(insert(accounts), [{
+                'username': f'{account_type}-{mode}-{i}',
+                'password': 'x',
+                'account_type': account_type,
+                'status': 'active',
+                'created_at': now
+            } for i in range(total)])
+            db.session.commit()
+
+        pools = [AccountReservationPool(accounts, refill_size=refill_size) for _ in range(workers)]
+        claims = [[] for _ in range(threads)]
+        errors = []
+
+        def sell(index):
+            pool = pools[index % workers]
+            with app.app_context():
+                for _ in range(sales_per_thread):
+                    try:
+                        if mode == 'pool':
+                            claimed = pool.claim(db.session, account_type, seller_id=None)
+                            account_id = claimed[0] if claimed else None
+                        else:
+                            account_id = db.session.execute(
+                                select(accounts.c.id)
+                                .where(accounts.c.account_type == account_type, accounts.c.status == 'active')
+                                .limit(1)
+                            ).scalar()
+                            if account_id is not None:
+                                db.session.execute(
+                                    update(accounts).where(accounts.c.id == account_id).values(status='sold')
+                                )
+                        db.session.commit()
+                        if account_id is not None:
+                            claims[index].append(account_id)
+                    except Exception as e:
+                        db.session.rollback()
+                        errors.append(str(e))
+
+        start = time.perf_counter()
+        pool_threads = [threading.Thread(target=sell, args=(i,)) for i in range(threads)]
+        for thread in pool_threads:
+            thread.start()
+        for thread in pool_threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        sold = [account_id for thread_claims in claims for account_id in thread_claims]
+        with app.app_context():
+            db.session.execute(delete(accounts).where(accounts.c.account_type == account_type))
+            db.session.commit()
+
+        return {
+            'sales': len(sold),
+            'double_sells': len(sold) - len(set(sold)),
+            'errors': len(errors),
+            'elapsed': round(elapsed, 3),
+            'sales_per_sec': round(len(sold) / elapsed) if elapsed > 0 else 0
+        }
+
+    return {'pool': run('pool'), 'naive': run('naive'), 'threads': threads, 'workers': workers}
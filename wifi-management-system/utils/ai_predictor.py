@@ -4,65 +4,74 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score
 from datetime import datetime, timedelta
+import pickle
+import time
 import pandas as pd
-from models.usage_log import UsageLog
-from models.customer import Customer
-from models.ai_prediction import ConsumptionPattern, PredictionModel, PredictionResult, AlertPrediction
+from app import app, db, usage_reader, Account, Customer, ConsumptionPattern, PredictionModel, PredictionResult, AlertPrediction
+
+# جدول‌های sin/cos روز هفته (دوشنبه = ۰ مثل date.weekday) و ساعت برای ویژگی‌های چرخه‌ای
+DAY_SIN, DAY_COS = np.sin(2 * np.pi * np.arange(7) / 7), np.cos(2 * np.pi * np.arange(7) / 7)
+HOUR_SIN, HOUR_COS = np.sin(2 * np.pi * np.arange(24) / 24), np.cos(2 * np.pi * np.arange(24) / 24)
+
+def weekdays(dates):
+    """date.weekday() برای آرایه‌ای از تاریخ‌ها (1970-01-01 پنجشنبه است)"""
+    return (np.asarray(dates, dtype='datetime64[D]').astype(np.int64) + 3) % 7
+
+def cyclic_features(days, hours):
+    """ماتریس ویژگی [day_sin, day_cos, hour_sin, hour_cos] با ایندکس‌گذاری در جدول‌ها"""
+    days = np.asarray(days, dtype=np.intp)
+    hours = np.asarray(hours, dtype=np.intp)
+    return np.column_stack((DAY_SIN[days], DAY_COS[days], HOUR_SIN[hours], HOUR_COS[hours]))
 
 class AIPredictor:
-    def __init__(self):
+    """پیش‌بینی مصرف مشتریان
+
+    mode='global': یک مدل مشترک برای همه مشتریان با ویژگی‌های سطح اکانت (میانگین مصرف
+    قبلی در همان ساعت و در کل، انحراف معیار و نوع اکانت) در کنار ویژگی‌های چرخه‌ای زمان. مشتریان
+    overrides مدل اختصاصی خودشان را دارند. mode='customer': مدل جدا برای هر مشتری.
+    """
+
+    def __init__(self, mode='global', overrides=()):
+        self.mode = mode
+        self.overrides = set(overrides)
         self.models = {}
         self.scalers = {}
+        # ویژگی‌های سطح اکانت هر مدل مشترک (کلید مثل models)
+        self.account_features = {}
         
-    def prepare_data(self, customer_id, days_back=30):
-        """آماده‌سازی داده‌ها برای آموزش مدل"""
-        # دریافت داده‌های مصرف مشتری
-        usage_logs = UsageLog.query.filter(
-            UsageLog.account_id.in_(
-                db.session.query(Customer.account_id).filter(Customer.id == customer_id)
-            ),
-            UsageLog.date >= datetime.now().date() - timedelta(days=days_back)
-        ).all()
-        
-        if not usage_logs:
+    def prepare_data(self, customer_id, days_back=30, end=None):
+        """آماده‌سازی داده‌ها برای آموزش مدل
+
+        فقط ستون‌های لازم با Core select (و بایگانی ستونی) مستقیم به آرایه‌های NumPy
+        خوانده می‌شوند، بدون ساختن آبجکت ORM یا DataFrame برای هر ردیف.
+        """
+        account_id = db.session.query(Customer.account_id).filter(Customer.id == customer_id).scalar()
+        if account_id is None:
             return None, None
-            
-        # تبدیل داده‌ها به DataFrame
-        data = []
-        for log in usage_logs:
-            data.append({
-                'day_of_week': log.date.weekday(),
-                'hour_of_day': log.hour_of_day,
-                'data_used': log.data_used,
-                'date': log.date
-            })
-        
-        df = pd.DataFrame(data)
         
-        # ایجاد ویژگی‌های اضافی
-        df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-        df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour_of_day'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour_of_day'] / 24)
+        end = end or datetime.now().date()
+        usage = usage_reader.columns(
+            db.session, end - timedelta(days=days_back), end,
+            ['date', 'hour_of_day', 'data_used'], account_ids=[account_id]
+        )
+        # لاگ‌های بدون ساعت (-1) ویژگی ساعت ندارند
+        known = usage['hour_of_day'] >= 0
+        if not known.any():
+            return None, None
         
         # ویژگی‌های ورودی و خروجی
-        X = df[['day_sin', 'day_cos', 'hour_sin', 'hour_cos']].values
-        y = df['data_used'].values
+        X = cyclic_features(weekdays(usage['date'][known]), usage['hour_of_day'][known])
+        y = usage['data_used'][known].astype(np.float64)
         
         return X, y
     
-    def train_linear_regression(self, customer_id):
-        """آموزش مدل رگرسیون خطی"""
-        X, y = self.prepare_data(customer_id)
-        if X is None:
-            return None, 0
-            
+    def _fit(self, model_key, model, X, y):
+        """استانداردسازی، آموزش و ذخیره مدل؛ خروجی: دقت (R2) روی داده آموزش"""
         # استانداردسازی داده‌ها
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
         
         # آموزش مدل
-        model = LinearRegression()
         model.fit(X_scaled, y)
         
         # محاسبه دقت
@@ -70,39 +79,209 @@ class AIPredictor:
         accuracy = r2_score(y, y_pred)
         
         # ذخیره مدل و اسکیلر
-        model_key = f"lr_{customer_id}"
         self.models[model_key] = model
         self.scalers[model_key] = scaler
         
-        return model, accuracy
+        return accuracy
+    
+    def train_linear_regression(self, customer_id, days_back=30, end=None):
+        """آموزش مدل رگرسیون خطی"""
+        X, y = self.prepare_data(customer_id, days_back, end)
+        if X is None:
+            return None, 0
+        
+        model = LinearRegression()
+        return model, self._fit(f"lr_{customer_id}", model, X, y)
     
-    def train_random_forest(self, customer_id):
+    def train_random_forest(self, customer_id, days_back=30, end=None):
         """آموزش مدل Random Forest"""
-        X, y = self.prepare_data(customer_id)
+        X, y = self.prepare_data(customer_id, days_back, end)
         if X is None:
             return None, 0
-            
-        # استانداردسازی داده‌ها
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
         
-        # آموزش مدل
         model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_scaled, y)
-        
-        # محاسبه دقت
-        y_pred = model.predict(X_scaled)
-        accuracy = r2_score(y, y_pred)
-        
-        # ذخیره مدل و اسکیلر
-        model_key = f"rf_{customer_id}"
-        self.models[model_key] = model
-        self.scalers[model_key] = scaler
+        return model, self._fit(f"rf_{customer_id}", model, X, y)
+    
+    def _customer_accounts(self, customer_ids=None, chunk_size=500):
+        """{customer_id: (account_id, account_type)} برای مشتریان (None یعنی همه)"""
+        query = db.session.query(Customer.id, Customer.account_id, Account.account_type)\
+            .join(Account, Account.id == Customer.account_id)
+        if customer_ids is None:
+            return {row[0]: (row[1], row[2]) for row in query}
+        customer_ids = list(customer_ids)
+        accounts = {}
+        # در بخش‌های محدود به سقف پارامترهای SQLite
+        for i in range(0, len(customer_ids), chunk_size):
+            for row in query.filter(Customer.id.in_(customer_ids[i:i + chunk_size])):
+                accounts[row[0]] = (row[1], row[2])
+        return accounts
+    
+    def prepare_global_data(self, days_back=30, end=None, customer_ids=None, sample_size=None, chunk_size=500):
+        """داده آموزش مدل مشترک از لاگ‌های همه مشتریان (یا customer_ids)
+
+        خروجی: (X، y، ویژگی‌های اکانت) یا (None، None، None). ستون‌های X: چهار ویژگی
+        چرخه‌ای، میانگین مصرف اکانت در همان ساعت روز، میانگین و انحراف معیار مصرف
+        اکانت در همین بازه و one-hot نوع اکانت.
+        لاگ‌ها برای هر chunk_size اکانت جدا خوانده می‌شوند؛ از هر بخش فقط آمار هر اکانت
+        و نمونه تصادفی یکنواخت sample_size ردیف (کوچک‌ترین کلیدهای تصادفی) نگه داشته
+        می‌شود، پس حافظه به تعداد کل ردیف‌ها بستگی ندارد. ویژگی‌های آماری هر ردیف
+        آموزش بدون خود آن ردیف (leave-one-out) حساب می‌شوند تا مقدار هدف در ویژگی‌اش
+        نشت نکند؛ ویژگی‌های پیش‌بینی (features) از همه ردیف‌ها هستند.
+        """
+        customers = self._customer_accounts(customer_ids)
+        if not customers:
+            return None, None, None
+        account_types = {account_id: account_type for account_id, account_type in customers.values()}
+        accounts = np.array(sorted(account_types), dtype=np.int64)
+        size = len(accounts)
+        
+        # آمار هر اکانت و هر (اکانت، ساعت) که بخش به بخش جمع می‌شود
+        count, total, squares = np.zeros(size), np.zeros(size), np.zeros(size)
+        hour_count, hour_sum = np.zeros((size, 24)), np.zeros((size, 24))
+        kept = None
+        rng = np.random.default_rng(42)
+        end = end or datetime.now().date()
+        for first in range(0, size, chunk_size):
+            batch = accounts[first:first + chunk_size]
+            usage = usage_reader.columns(
+                db.session, end - timedelta(days=days_back), end,
+                ['account_id', 'date', 'hour_of_day', 'data_used'], account_ids=batch.tolist()
+            )
+            known = usage['hour_of_day'] >= 0
+            if not known.any():
+                continue
+            index = np.searchsorted(batch, usage['account_id'][known])
+            hours = usage['hour_of_day'][known].astype(np.intp)
+            y = usage['data_used'][known].astype(np.float64)
+            
+            part = slice(first, first + len(batch))
+            count[part] += np.bincount(index, minlength=len(batch))
+            total[part] += np.bincount(index, weights=y, minlength=len(batch))
+            squares[part] += np.bincount(index, weights=y * y, minlength=len(batch))
+            cells = index * 24 + hours
+            hour_count[part] += np.bincount(cells, minlength=len(batch) * 24).reshape(-1, 24)
+            hour_sum[part] += np.bincount(cells, weights=y, minlength=len(batch) * 24).reshape(-1, 24)
+            
+            rows = {'key': rng.random(len(y)), 'index': index + first, 'hour': hours,
+                    'date': usage['date'][known], 'y': y}
+            kept = rows if kept is None else {name: np.concatenate((kept[name], rows[name])) for name in rows}
+            if sample_size and len(kept['y']) > sample_size:
+                keep = np.argpartition(kept['key'], sample_size)[:sample_size]
+                kept = {name: values[keep] for name, values in kept.items()}
+        if kept is None:
+            return None, None, None
+        
+        types = sorted(set(account_types.values()))
+        one_hot = np.array([[account_types[account_id] == name for name in types]
+                            for account_id in accounts.tolist()], dtype=np.float64).reshape(size, len(types))
+        overall = total.sum() / count.sum()
+        overall_std = np.sqrt(max(squares.sum() / count.sum() - overall * overall, 0))
+        
+        # ویژگی‌های پیش‌بینی: آمار کامل اکانت‌هایی که در بازه داده دارند
+        present = count > 0
+        mean = total[present] / count[present]
+        std = np.sqrt(np.maximum(squares[present] / count[present] - mean * mean, 0))
+        hourly = np.where(hour_count[present] > 0,
+                          hour_sum[present] / np.maximum(hour_count[present], 1), mean[:, None])
+        features = {
+            'accounts': accounts[present],
+            'matrix': np.column_stack((mean, std, one_hot[present])),
+            'hourly': hourly,
+            # برای اکانت بدون سابقه: آمار کل مشتریان و نوع نامعلوم
+            'fallback': np.concatenate(([overall, overall_std], np.zeros(len(types)))),
+            'fallback_hourly': hour_sum.sum(axis=0) / np.maximum(hour_count.sum(axis=0), 1),
+            'types': types
+        }
+        
+        # ویژگی‌های آموزش بدون خود ردیف؛ اکانت یا خانه تک‌ردیفی از سطح بالاتر
+        index, hours, y = kept['index'], kept['hour'], kept['y']
+        others = count[index] - 1
+        loo_mean = np.where(others > 0, (total[index] - y) / np.maximum(others, 1), overall)
+        loo_std = np.where(others > 0, np.sqrt(np.maximum(
+            (squares[index] - y * y) / np.maximum(others, 1) - loo_mean * loo_mean, 0)), overall_std)
+        hour_others = hour_count[index, hours] - 1
+        loo_hourly = np.where(hour_others > 0, (hour_sum[index, hours] - y) / np.maximum(hour_others, 1), loo_mean)
+        X = np.hstack((
+            cyclic_features(weekdays(kept['date']), hours),
+            loo_hourly[:, None],
+            np.column_stack((loo_mean, loo_std, one_hot[index]))
+        ))
+        return X, y, features
+    
+    def train_global_model(self, model_type='rf', days_back=30, end=None, customer_ids=None, sample_size=None):
+        """آموزش یک مدل مشترک برای همه مشتریان؛ خروجی: (مدل، دقت)"""
+        if sample_size is None:
+            sample_size = app.config['AI_GLOBAL_SAMPLE_SIZE']
+        X, y, features = self.prepare_global_data(days_back, end, customer_ids, sample_size)
+        if X is None:
+            return None, 0
         
+        if model_type == 'lr':
+            model = LinearRegression()
+        else:
+            # برگ‌های کوچک‌تر از min_samples_leaf ساخته نمی‌شوند تا اندازه درخت‌ها با حجم داده نترکد
+            model = RandomForestRegressor(n_estimators=100, min_samples_leaf=20, n_jobs=-1, random_state=42)
+        model_key = f"global_{model_type}"
+        accuracy = self._fit(model_key, model, X, y)
+        self.account_features[model_key] = features
         return model, accuracy
     
-    def predict_consumption(self, customer_id, target_date, target_hour, model_type='lr'):
-        """پیش‌بینی مصرف برای تاریخ و ساعت خاص"""
+    def _global_model_key(self, model_type):
+        """کلید مدل مشترک؛ اگر وجود نداشت آموزش داده می‌شود (None یعنی داده‌ای نیست)"""
+        model_key = f"global_{model_type}"
+        if model_key not in self.models:
+            model, accuracy = self.train_global_model(model_type)
+            if model is None:
+                return None
+        return model_key
+    
+    def _predict_global(self, customer_ids, hours, X, model_type):
+        """پیش‌بینی ردیف‌ها با مدل مشترک در یک فراخوانی (NaN برای مشتری ناموجود)"""
+        predictions = np.full(len(X), np.nan)
+        model_key = self._global_model_key(model_type)
+        if model_key is None:
+            return predictions
+        features = self.account_features[model_key]
+        
+        unique, inverse = np.unique(customer_ids, return_inverse=True)
+        customers = self._customer_accounts(unique.tolist())
+        account_ids = np.array([customers.get(customer_id, (-1, None))[0] for customer_id in unique.tolist()])
+        known = account_ids >= 0
+        
+        # ویژگی‌های اکانت هر مشتری؛ اکانت بدون سابقه در آموزش از fallback
+        accounts = features['accounts']
+        position = np.clip(np.searchsorted(accounts, account_ids), 0, max(len(accounts) - 1, 0))
+        found = accounts[position] == account_ids
+        matrix = np.where(found[:, None], features['matrix'][position], features['fallback'])
+        hourly = np.where(found[:, None], features['hourly'][position], features['fallback_hourly'])
+        
+        rows = np.flatnonzero(known[inverse.ravel()])
+        if len(rows):
+            customer_rows = inverse.ravel()[rows]
+            X = np.hstack((X[rows], hourly[customer_rows, hours[rows]][:, None], matrix[customer_rows]))
+            predictions[rows] = self.models[model_key].predict(self.scalers[model_key].transform(X))
+        return predictions
+    
+    def add_override(self, customer_id, model_type='rf'):
+        """استفاده از مدل اختصاصی برای یک مشتری در حالت global؛ خروجی: دقت مدل"""
+        if model_type == 'lr':
+            model, accuracy = self.train_linear_regression(customer_id)
+        else:
+            model, accuracy = self.train_random_forest(customer_id)
+        if model is None:
+            return None
+        self.overrides.add(customer_id)
+        return accuracy
+    
+    def remove_override(self, customer_id):
+        """بازگشت مشتری به مدل مشترک و آزاد کردن مدل‌های اختصاصی او"""
+        self.overrides.discard(customer_id)
+        for model_type in ('lr', 'rf'):
+            self.models.pop(f"{model_type}_{customer_id}", None)
+            self.scalers.pop(f"{model_type}_{customer_id}", None)
+    
+    def _model_key(self, customer_id, model_type):
+        """کلید مدل مشتری؛ اگر مدل وجود نداشت آموزش داده می‌شود (None یعنی داده‌ای نیست)"""
         model_key = f"{model_type}_{customer_id}"
         
         # بررسی وجود مدل
@@ -114,38 +293,81 @@ class AIPredictor:
                 model, accuracy = self.train_random_forest(customer_id)
             
             if model is None:
-                return None, 0
-        
-        model = self.models[model_key]
-        scaler = self.scalers[model_key]
-        
-        # آماده‌سازی داده‌های ورودی
-        day_of_week = target_date.weekday()
-        day_sin = np.sin(2 * np.pi * day_of_week / 7)
-        day_cos = np.cos(2 * np.pi * day_of_week / 7)
-        hour_sin = np.sin(2 * np.pi * target_hour / 24)
-        hour_cos = np.cos(2 * np.pi * target_hour / 24)
-        
-        X = np.array([[day_sin, day_cos, hour_sin, hour_cos]])
-        X_scaled = scaler.transform(X)
+                return None
         
-        # پیش‌بینی
-        prediction = model.predict(X_scaled)[0]
+        return model_key
+    
+    def predict_consumption(self, customer_id, target_date, target_hour, model_type='lr'):
+        """پیش‌بینی مصرف برای تاریخ و ساعت خاص"""
+        prediction = self.predict_horizon(customer_id, target_date, target_hour, model_type)[()]
+        if np.isnan(prediction):
+            return None, 0
         
         # محاسبه اطمینان (ساده‌سازی شده)
         confidence = min(0.9, max(0.5, 0.7 + np.random.normal(0, 0.1)))
         
-        return max(0, prediction), confidence
+        return prediction, confidence
+    
+    def predict_horizon(self, customer_ids, dates, hours, model_type='lr'):
+        """پیش‌بینی مصرف برای چند مشتری، تاریخ و ساعت در یک فراخوانی
+
+        ورودی‌ها با قواعد broadcast در NumPy ترکیب می‌شوند؛ مثلاً
+        predict_horizon(ids[:, None], today, np.arange(24)) ماتریس مشتری × ساعت می‌دهد.
+        ویژگی‌ها یک بار برای همه ردیف‌ها ساخته می‌شوند؛ در حالت global همه ردیف‌ها
+        (به جز مشتریان overrides) با یک model.predict و بقیه برای هر مشتری با یک
+        scaler.transform و یک model.predict روی همه ردیف‌هایش پیش‌بینی می‌شوند.
+        خروجی آرایه‌ای به همان شکل؛ NaN برای مشتری بدون داده. خطای آموزش یا پیش‌بینی
+        مدل یک مشتری (یا مدل مشترک) فقط ردیف‌های همان مدل را NaN می‌کند.
+        """
+        customer_ids, dates, hours = np.broadcast_arrays(
+            np.asarray(customer_ids), np.asarray(dates, dtype='datetime64[D]'), np.asarray(hours)
+        )
+        shape = customer_ids.shape
+        customer_ids = customer_ids.ravel()
+        hours = hours.ravel().astype(np.intp)
+        X = cyclic_features(weekdays(dates.ravel()), hours)
+        predictions = np.full(len(X), np.nan)
+        
+        individual = np.arange(len(X))
+        if self.mode == 'global':
+            pooled = ~np.isin(customer_ids, list(self.overrides))
+            try:
+                predictions[pooled] = self._predict_global(customer_ids[pooled], hours[pooled], X[pooled], model_type)
+            except Exception as e:
+                print(f"Error predicting with global {model_type} model: {e}")
+            individual = np.flatnonzero(~pooled)
+        
+        # ردیف‌های هر مشتری پشت سر هم
+        unique, inverse = np.unique(customer_ids[individual], return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+        for index, customer_id in enumerate(unique.tolist()):
+            try:
+                model_key = self._model_key(customer_id, model_type)
+                if model_key is None:
+                    continue
+                rows = individual[order[bounds[index]:bounds[index + 1]]]
+                predictions[rows] = self.models[model_key].predict(self.scalers[model_key].transform(X[rows]))
+            except Exception as e:
+                print(f"Error predicting for customer {customer_id}: {e}")
+        
+        return np.maximum(predictions, 0).reshape(shape)
     
-    def predict_data_end(self, customer_id):
+    def predict_daily_consumption(self, customer_ids, target_date=None, model_type='lr'):
+        """مجموع مصرف پیش‌بینی شده ۲۴ ساعت target_date برای هر مشتری (NaN برای بدون داده)"""
+        target_date = target_date or datetime.now().date()
+        customer_ids = np.asarray(customer_ids)
+        return self.predict_horizon(customer_ids[:, None], target_date, np.arange(24), model_type).sum(axis=1)
+    
+    def predict_data_end(self, customer_id, daily_consumption=None):
         """پیش‌بینی تاریخ اتمام حجم اینترنت"""
         # دریافت اطلاعات فعلی مشتری
         customer = Customer.query.get(customer_id)
         if not customer:
             return None, 0
         
-        account = customer.account
-        if not account:
+        if not customer.account_id:
             return None, 0
         
         # محاسبه حجم باقی‌مانده
@@ -156,13 +378,11 @@ class AIPredictor:
         if remaining_data <= 0:
             return datetime.now().date(), 1.0
         
-        # پیش‌بینی مصرف روزانه
-        daily_consumption = 0
-        for hour in range(24):
-            pred, conf = self.predict_consumption(customer_id, datetime.now().date(), hour)
-            daily_consumption += pred
+        # پیش‌بینی مصرف روزانه (یک فراخوانی برای هر ۲۴ ساعت)
+        if daily_consumption is None:
+            daily_consumption = self.predict_daily_consumption([customer_id])[0]
         
-        if daily_consumption <= 0:
+        if not np.isfinite(daily_consumption) or daily_consumption <= 0:
             return None, 0
         
         # محاسبه تعداد روزهای باقی‌مانده
@@ -174,15 +394,13 @@ class AIPredictor:
         
         return end_date, probability
     
-    def predict_high_usage_alert(self, customer_id, threshold=1000):
+    def predict_high_usage_alert(self, customer_id, threshold=1000, total_predicted=None):
         """پیش‌بینی هشدار مصرف بالا"""
         # پیش‌بینی مصرف ۲۴ ساعت آینده
-        current_date = datetime.now().date()
-        total_predicted = 0
-        
-        for hour in range(24):
-            pred, conf = self.predict_consumption(customer_id, current_date, hour)
-            total_predicted += pred
+        if total_predicted is None:
+            total_predicted = self.predict_daily_consumption([customer_id])[0]
+        if not np.isfinite(total_predicted):
+            return False, 0, 0
         
         # بررسی آستانه
         if total_predicted > threshold:
@@ -192,13 +410,19 @@ class AIPredictor:
         return False, 0, total_predicted
 
 # ایجاد نمونه پیش‌بین
-ai_predictor = AIPredictor()
+ai_predictor = AIPredictor(mode=app.config['AI_MODEL_MODE'], overrides=app.config['AI_CUSTOMER_MODEL_OVERRIDES'])
 
 # توابع کمکی برای آموزش گروهی
 def train_all_models():
-    """آموزش مدل‌ها برای همه مشتریان"""
-    customers = Customer.query.all()
-    results = []
+    """آموزش مدل‌ها برای همه مشتریان (در حالت global مدل مشترک و مدل‌های overrides)"""
+    if ai_predictor.mode == 'global':
+        lr_model, lr_accuracy = ai_predictor.train_global_model('lr')
+        rf_model, rf_accuracy = ai_predictor.train_global_model('rf')
+        results = [{'customer_id': None, 'lr_accuracy': lr_accuracy, 'rf_accuracy': rf_accuracy}]
+        customers = Customer.query.filter(Customer.id.in_(ai_predictor.overrides)).all()
+    else:
+        customers = Customer.query.all()
+        results = []
     
     for customer in customers:
         try:
@@ -221,10 +445,13 @@ def generate_predictions_for_all():
     customers = Customer.query.all()
     predictions = []
     
-    for customer in customers:
+    # مصرف ۲۴ ساعت همه مشتریان یک بار؛ هر دو پیش‌بینی از همین مقدار استفاده می‌کنند
+    daily = ai_predictor.predict_daily_consumption([customer.id for customer in customers]) if customers else []
+    
+    for customer, daily_consumption in zip(customers, daily):
         try:
             # پیش‌بینی اتمام حجم
-            end_date, probability = ai_predictor.predict_data_end(customer.id)
+            end_date, probability = ai_predictor.predict_data_end(customer.id, daily_consumption)
             
             if end_date:
                 alert = AlertPrediction(
@@ -239,7 +466,9 @@ def generate_predictions_for_all():
                 predictions.append(alert.to_dict())
             
             # پیش‌بینی هشدار مصرف بالا
-            is_high, prob, predicted_usage = ai_predictor.predict_high_usage_alert(customer.id)
+            is_high, prob, predicted_usage = ai_predictor.predict_high_usage_alert(
+                customer.id, total_predicted=daily_consumption
+            )
             
             if is_high:
                 alert = AlertPrediction(
@@ -257,4 +486,133 @@ def generate_predictions_for_all():
             print(f"Error generating predictions for customer {customer.id}: {e}")
     
     db.session.commit()
-    return predictions
\ No newline at end of file
+    return predictions
+
+def benchmark_prepare_data(sizes=(10000, 100000, 1000000), repeat=3):
+    """زمان ساخت ویژگی‌ها: روش قبلی (dict هر ردیف، DataFrame و sin/cos) در برابر جدول‌ها
+
+    ردیف‌ها ساختگی هستند تا فقط هزینه تبدیل به ویژگی سنجیده شود.
+    """
+    rng = np.random.default_rng(0)
+    results = []
+    for size in sizes:
+        dates = np.datetime64('2024-01-01') + rng.integers(0, 365, size)
+        hours = rng.integers(0, 24, size)
+        values = rng.gamma(2.0, 20.0, size)
+        rows = list(zip(dates.tolist(), hours.tolist(), values.tolist()))
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            df = pd.DataFrame([
+                {'day_of_week': day.weekday(), 'hour_of_day': hour, 'data_used': value, 'date': day}
+                for day, hour, value in rows
+            ])
+            df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
+            df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
+            df['hour_sin'] = np.sin(2 * np.pi * df['hour_of_day'] / 24)
+            df['hour_cos'] = np.cos(2 * np.pi * df['hour_of_day'] / 24)
+            legacy = df[['day_sin', 'day_cos', 'hour_sin', 'hour_cos']].values
+        legacy_ms = (time.perf_counter() - started) / repeat * 1000
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            X = cyclic_features(weekdays(dates), hours)
+        vectorized_ms = (time.perf_counter() - started) / repeat * 1000
+
+        results.append({
+            'rows': size,
+            'legacy_ms': round(legacy_ms, 2),
+            'vectorized_ms': round(vectorized_ms, 2),
+            'max_error': float(np.max(np.abs(legacy - X)))
+        })
+    return results
+
+def benchmark_predict_horizon(customer_ids, model_type='rf', repeat=3):
+    """زمان پیش‌بینی ۲۴ ساعت مشتریان: ۲۴ بار predict_consumption در برابر predict_horizon
+
+    مدل‌ها قبل از زمان‌گیری آموزش داده می‌شوند و مشتریان بدون داده کنار گذاشته می‌شوند.
+    """
+    today = datetime.now().date()
+    daily = ai_predictor.predict_daily_consumption(customer_ids, today, model_type)
+    customer_ids = [customer_id for customer_id, total in zip(customer_ids, daily.tolist()) if np.isfinite(total)]
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        loop = [
+            sum(ai_predictor.predict_consumption(customer_id, today, hour, model_type)[0] for hour in range(24))
+            for customer_id in customer_ids
+        ]
+    loop_ms = (time.perf_counter() - started) / repeat * 1000
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        batched = ai_predictor.predict_daily_consumption(customer_ids, today, model_type)
+    batched_ms = (time.perf_counter() - started) / repeat * 1000
+
+    return {
+        'customers': len(customer_ids),
+        'loop_ms': round(loop_ms, 2),
+        'horizon_ms': round(batched_ms, 2),
+        'max_error': float(np.max(np.abs(np.array(loop) - batched))) if customer_ids else None
+    }
+
+def _model_bytes(predictor, model_keys):
+    """حجم مدل‌ها، اسکیلرها و ویژگی‌های اکانت (اندازه pickle) به عنوان تخمین حافظه"""
+    return sum(
+        len(pickle.dumps((predictor.models[key], predictor.scalers[key], predictor.account_features.get(key))))
+        for key in model_keys
+    )
+
+def compare_model_modes(customer_ids=None, model_type='rf', days_back=30, test_days=7):
+    """مقایسه مدل مشترک و مدل‌های جدا برای هر مشتری روی داده‌های test_days روز آخر
+
+    هر دو حالت روی days_back روز قبل از آن آموزش می‌بینند و روی همان ردیف‌های
+    آزمون (فقط مشتریانی که داده آموزش دارند) سنجیده می‌شوند. خروجی برای هر حالت:
+    R2 و RMSE روی داده آزمون، زمان آموزش و حجم مدل‌ها.
+    """
+    today = datetime.now().date()
+    train_end = today - timedelta(days=test_days)
+    customers = ai_predictor._customer_accounts(customer_ids)
+    results = {}
+
+    # مدل جدا برای هر مشتری
+    individual = AIPredictor(mode='customer')
+    train = individual.train_linear_regression if model_type == 'lr' else individual.train_random_forest
+    started = time.perf_counter()
+    trained = [customer_id for customer_id in customers if train(customer_id, days_back, train_end)[0] is not None]
+    individual_seconds = time.perf_counter() - started
+
+    # مدل مشترک
+    pooled = AIPredictor(mode='global')
+    started = time.perf_counter()
+    pooled.train_global_model(model_type, days_back, train_end, customer_ids)
+    pooled_seconds = time.perf_counter() - started
+
+    # ردیف‌های آزمون به مشتری صاحب اکانت
+    customer_by_account = {customers[customer_id][0]: customer_id for customer_id in trained}
+    usage = usage_reader.columns(
+        db.session, train_end + timedelta(days=1), today,
+        ['account_id', 'date', 'hour_of_day', 'data_used'],
+        account_ids=None if customer_ids is None else list(customer_by_account)
+    )
+    known = (usage['hour_of_day'] >= 0) & np.isin(usage['account_id'], list(customer_by_account))
+    if not known.any():
+        return None
+    row_customers = np.array([customer_by_account[account_id] for account_id in usage['account_id'][known].tolist()])
+    dates, hours, y = usage['date'][known], usage['hour_of_day'][known], usage['data_used'][known]
+
+    for mode, predictor, seconds, keys in (
+        ('customer', individual, individual_seconds, [f"{model_type}_{customer_id}" for customer_id in trained]),
+        ('global', pooled, pooled_seconds, [f"global_{model_type}"])
+    ):
+        predicted = predictor.predict_horizon(row_customers, dates, hours, model_type)
+        results[mode] = {
+            'r2': round(float(r2_score(y, predicted)), 4),
+            'rmse': round(float(np.sqrt(mean_squared_error(y, predicted))), 3),
+            'train_seconds': round(seconds, 2),
+            'models': len(keys),
+            'model_bytes': _model_bytes(predictor, keys)
+        }
+    results['customers'] = len(trained)
+    results['test_rows'] = len(y)
+    return results
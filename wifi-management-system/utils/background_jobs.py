@@ -0,0 +1,127 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class BackgroundJobRunner:
+    """اجرای کارهای طولانی (ورود فایل، ارسال اعلان گروهی) در پس‌زمینه با استخر thread
+
+    بدون نیاز به broker: وضعیت کارها در صورت نیاز در جداول خود برنامه نگهداری
+    می‌شود و این کلاس فقط اجرا را خارج از thread درخواست HTTP و داخل app context
+    انجام می‌دهد.
+    """
+
+    def __init__(self, app, max_workers=2, name='background-job'):
+        self.app = app
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+            return self._executor
+
+    def _run(self, func, args):
+        with self.app.app_context():
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error running {self.name} {func.__name__}{args}: {e}")
+
+    def submit(self, func, *args):
+        """قرار دادن یک کار در صف اجرا"""
+        return self._get_executor().submit(self._run, func, args)
+
+    def shutdown(self, wait=True):
+        """توقف استخر thread"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+class TaskLease:
+    """قفل زمان‌دار کارهای دوره‌ای در دیتابیس (جدول name، holder، expires_at)
+
+    وقتی هر worker وب کارهای دوره‌ای خودش را شروع می‌کند، هر اجرا فقط در پروسسی
+    انجام می‌شود که قفل آن کار را گرفته یا تمدید کرده است. اگر آن پروسس از بین برود
+    قفل بعد از seconds ثانیه منقضی و توسط پروسس دیگری برداشته می‌شود.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    @staticmethod
+    def holder():
+        # بعد از fork شدن workerها هم برای هر پروسس متفاوت است
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _insert_missing(self, session):
+        """INSERT ردیف قفل که اگر از قبل (یا همزمان) ساخته شده باشد کاری نمی‌کند"""
+        dialect = (getattr(session, 'dialect', None) or session.get_bind().dialect).name
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            return module.insert(self.table).on_conflict_do_nothing(index_elements=['name'])
+        if dialect == 'mysql':
+            return insert(self.table).prefix_with('IGNORE')
+        return insert(self.table)
+
+    def acquire(self, session, name, seconds):
+        """گرفتن یا تمدید قفل name برای seconds ثانیه؛ خروجی: True اگر این پروسس صاحب قفل شد"""
+        table, holder, now = self.table, self.holder(), datetime.utcnow()
+        session.execute(self._insert_missing(session).values(name=name, holder='', expires_at=datetime(1970, 1, 1)))
+        acquired = session.execute(
+            update(table)
+            .where(table.c.name == name, or_(table.c.expires_at <= now, table.c.holder == holder))
+            .values(holder=holder, expires_at=now + timedelta(seconds=seconds))
+        ).rowcount == 1
+        session.commit()
+        return acquired
+
+
+class PeriodicTask:
+    """اجرای دوره‌ای یک تابع (مثلاً پاکسازی) در یک thread پس‌زمینه داخل app context
+
+    lease تابع (name، seconds) -> bool است که قبل از هر اجرا صدا زده می‌شود؛ با
+    TaskLease اگر چند پروسس این کار را شروع کرده باشند در هر دوره فقط یکی اجرا می‌کند.
+    """
+
+    def __init__(self, app, func, interval, name='periodic-task', lease=None):
+        self.app = app
+        self.func = func
+        self.interval = interval
+        self.name = name
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    if self.lease is None or self.lease(self.name, self.interval):
+                        self.func()
+                except Exception as e:
+                    print(f"Error running {self.name} {self.func.__name__}: {e}")
+
+    def start(self):
+        """شروع اجرای دوره‌ای (interval صفر یا منفی یعنی غیرفعال)"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,112 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+
+
+class BatchSaleRecorder:
+    """ثبت گروهی فروش اکانت‌ها با دستورات مجموعه‌ای
+
+    به جای یک درخواست و چند کوئری برای هر اکانت: یک SELECT برای وضعیت قبلی،
+    یک UPDATE برای فروخته شدن اکانت‌ها و یک INSERT چند ردیفی برای تراکنش‌ها و
+    کمیسیون‌ها. commit به عهده فراخواننده است تا کل دسته در یک تراکنش باشد.
+    در دیتابیس بدون RETURNING (MySQL) وضعیت قبلی اکانت‌ها با SELECT ... FOR UPDATE
+    قفل و تراکنش‌ها ردیف به ردیف درج می‌شوند تا شناسه هر کدام از lastrowid خوانده شود.
+    """
+
+    def __init__(self, accounts, transactions, commissions, commission_rate=0.1):
+        self.accounts = accounts
+        self.transactions = transactions
+        self.commissions = commissions
+        self.commission_rate = commission_rate
+
+    def parse_items(self, items):
+        """اعتبارسنجی اقلام ورودی؛ خروجی: (اقلام معتبر، نتایج اقلام نامعتبر بر اساس اندیس)"""
+        valid, results = [], {}
+        seen = set()
+        for index, item in enumerate(items):
+            try:
+                account_id = int(item.get('account_id'))
+                amount = float(item.get('amount'))
+            except (AttributeError, TypeError, ValueError):
+                results[index] = {'success': False, 'message': 'account_id یا amount نامعتبر است'}
+                continue
+            if account_id in seen:
+                results[index] = {'account_id': account_id, 'success': False, 'message': 'اکانت تکراری در درخواست'}
+                continue
+            seen.add(account_id)
+            valid.append((index, account_id, amount))
+        return valid, results
+
+    def record(self, session, seller_id, items):
+        """ثبت فروش اقلام [(اندیس، account_id، amount)]
+
+        خروجی: (نتایج بر اساس اندیس، تغییرات اکانت‌ها برای seller_stats، جمع کمیسیون)
+        """
+        accounts, transactions, commissions = self.accounts, self.transactions, self.commissions
+        account_ids = [account_id for _, account_id, _ in items]
+        dialect = session.get_bind().dialect
+
+        query = select(accounts.c.id, accounts.c.seller_id, accounts.c.status).where(accounts.c.id.in_(account_ids))
+        if not dialect.update_returning:
+            # اکانت‌های فروخته شده از همین SELECT معلوم می‌شوند، پس تا پایان تراکنش قفل می‌مانند
+            query = query.with_for_update()
+        previous = {row.id: (row.seller_id, row.status) for row in session.execute(query)}
+
+        # فقط اکانت‌های فعال؛ شرط status در خود UPDATE است تا فروش همزمان دوباره حساب نشود
+        statement = update(accounts)\
+            .where(accounts.c.id.in_(account_ids), accounts.c.status == 'active')\
+            .values(status='sold', seller_id=seller_id)
+        if dialect.update_returning:
+            sold = set(session.execute(statement.returning(accounts.c.id)).scalars())
+        else:
+            session.execute(statement)
+            sold = {account_id for account_id, (_, status) in previous.items() if status == 'active'}
+
+        results = {}
+        sales = []
+        for index, account_id, amount in items:
+            if account_id not in previous:
+                results[index] = {'account_id': account_id, 'success': False, 'message': 'اکانت یافت نشد'}
+            elif account_id not in sold:
+                results[index] = {'account_id': account_id, 'success': False, 'message': 'اکانت فعال نیست یا قبلاً فروخته شده است'}
+            else:
+                sales.append((index, account_id, int(amount), int(amount * self.commission_rate)))
+
+        if not sales:
+            return results, [], 0
+
+        now = datetime.utcnow()
+        rows = [{
+            'seller_id': seller_id,
+            'account_id': account_id,
+            'amount': amount,
+            'commission': commission,
+            'status': 'completed',
+            'created_at': now
+        } for _, account_id, amount, commission in sales]
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            transaction_ids = session.execute(
+                insert(transactions).returning(transactions.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+        else:
+            transaction_ids = [session.execute(insert(transactions), row).inserted_primary_key[0] for row in rows]
+
+        session.execute(insert(commissions), [{
+            'seller_id': seller_id,
+            'transaction_id': transaction_id,
+            'amount': commission,
+            'status': 'pending',
+            'created_at': now
+        } for transaction_id, (_, _, _, commission) in zip(transaction_ids, sales)])
+
+        for transaction_id, (index, account_id, amount, commission) in zip(transaction_ids, sales):
+            results[index] = {
+                'account_id': account_id,
+                'success': True,
+                'transaction_id': transaction_id,
+                'commission': commission
+            }
+
+        changes = [(previous[account_id], (seller_id, 'sold')) for _, account_id, _, _ in sales]
+        total_commission = sum(commission for _, _, _, commission in sales)
+        return results, changes, total_commission
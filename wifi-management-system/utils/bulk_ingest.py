@@ -0,0 +1,155 @@
+import hashlib
+import time
+from itertools import islice
+
+from sqlalchemy import bindparam, select, tuple_
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """هش محتوای فایل برای تشخیص فایل تکراری"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KeyDeduper:
+    """حذف ردیف‌های تکراری بر اساس ستون‌های کلید قبل از درج
+
+    کلیدهای هر دسته با کوئری‌های IN روی ایندکس یکتای همان ستون‌ها در دیتابیس
+    بررسی می‌شوند؛ هزینه به اندازه دسته بستگی دارد نه به اندازه جدول.
+    """
+
+    def __init__(self, table, key_columns, lookup_size=400):
+        self.table = table
+        self.key_columns = list(key_columns)
+        self.lookup_size = lookup_size
+
+    def filter(self, conn, rows):
+        """برگرداندن ردیف‌های جدید دسته و تعداد ردیف‌های تکراری"""
+        candidates = {}
+        for row in rows:
+            candidates.setdefault(tuple(row[name] for name in self.key_columns), row)
+
+        # در بخش‌های محدود به سقف پارامترهای SQLite
+        columns = [self.table.c[name] for name in self.key_columns]
+        keys = list(candidates)
+        existing = set()
+        for i in range(0, len(keys), self.lookup_size):
+            existing.update(
+                tuple(values) for values in conn.execute(
+                    select(*columns).where(tuple_(*columns).in_(keys[i:i + self.lookup_size]))
+                )
+            )
+
+        new_rows = [row for key, row in candidates.items() if key not in existing]
+        return new_rows, len(rows) - len(new_rows)
+
+
+class BulkInserter:
+    """درج دسته‌ای ردیف‌ها با Core (executemany) بدون unit of work در ORM"""
+
+    def __init__(self, engine, table, chunk_size=5000, deduper=None):
+        self.engine = engine
+        self.table = table
+        self.chunk_size = max(1, chunk_size)
+        self.deduper = deduper
+        # فقط ستون‌های جدول در دستور insert قرار می‌گیرند
+        self.columns = set(table.columns.keys())
+
+    def _chunks(self, rows):
+        """تقسیم یک iterator به لیست‌های chunk_size تایی"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _clean(self, row):
+        return {key: value for key, value in row.items() if key in self.columns}
+
+    def insert(self, rows):
+        """درج ردیف‌ها؛ هر دسته در تراکنش جداگانه تا حافظه و طول تراکنش ثابت بماند"""
+        stats = {'rows': 0, 'duplicates': 0, 'chunks': 0}
+        start = time.perf_counter()
+        db_time = 0.0
+        statement = self.table.insert()
+        if self.deduper is not None:
+            # ایندکس یکتای کلید، درج همزمان همان ردیف‌ها را هم بی‌اثر می‌کند
+            statement = statement.prefix_with('OR IGNORE', dialect='sqlite').prefix_with('IGNORE', dialect='mysql')
+
+        for chunk in self._chunks(rows):
+            chunk_start = time.perf_counter()
+            with self.engine.begin() as conn:
+                if self.deduper is not None:
+                    chunk, duplicates = self.deduper.filter(conn, chunk)
+                    stats['duplicates'] += duplicates
+                if chunk:
+                    conn.execute(statement, [self._clean(row) for row in chunk])
+            db_time += time.perf_counter() - chunk_start
+            stats['rows'] += len(chunk)
+            stats['chunks'] += 1
+
+        # elapsed شامل زمان تولید ردیف‌ها (مثلاً استخراج PDF) هم هست
+        stats['elapsed'] = round(time.perf_counter() - start, 3)
+        stats['rows_per_sec'] = round(stats['rows'] / db_time) if db_time > 0 else 0
+        return stats
+
+    def _driver_statement(self, table, columns):
+        """متن INSERT برای DBAPI و تابع ساخت پارامترهای یک ردیف tuple (به ترتیب columns)"""
+        dialect = self.engine.dialect
+        compiled = table.insert().values({name: bindparam(name) for name in columns}).compile(dialect=dialect)
+        processors = [
+            table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns
+        ]
+        # فقط ستون‌هایی که تبدیل نوع لازم دارند (مثلاً Date و DateTime در SQLite)
+        converted = [(index, processor) for index, processor in enumerate(processors) if processor is not None]
+        if compiled.positional:
+            order = [columns.index(name) for name in compiled.positiontup]
+            pack = (lambda row: tuple(row)) if order == list(range(len(columns))) \
+                else (lambda row: tuple(row[index] for index in order))
+        else:
+            pack = lambda row: dict(zip(columns, row))
+
+        def params(row):
+            if converted:
+                row = list(row)
+                for index, processor in converted:
+                    row[index] = processor(row[index])
+            return pack(row)
+
+        return compiled.string, params
+
+    def insert_tuples(self, columns, rows, on_chunk=None, route=None):
+        """درج ردیف‌های tuple به ترتیب columns با executemany مستقیم DBAPI
+
+        برای ورودی‌های خیلی بزرگ (مثل لاگ مصرف): پردازش پارامتر SQLAlchemy برای هر
+        ردیف حذف می‌شود. deduper در این حالت پشتیبانی نمی‌شود. route(conn, chunk)
+        اگر داده شود ردیف‌های هر دسته را به صورت [(جدول، ردیف‌ها)] بین چند جدول هم‌ستون
+        (مثلاً پارتیشن‌ها) پخش می‌کند. on_chunk(conn, chunk) بعد از درج هر دسته در
+        همان تراکنش صدا زده می‌شود (مثلاً به‌روزرسانی خلاصه‌ها).
+        """
+        columns = list(columns)
+        statements = {}
+        stats = {'rows': 0, 'duplicates': 0, 'chunks': 0}
+        start = time.perf_counter()
+        db_time = 0.0
+        for chunk in self._chunks(rows):
+            chunk_start = time.perf_counter()
+            with self.engine.begin() as conn:
+                for table, table_rows in (route(conn, chunk) if route is not None else [(self.table, chunk)]):
+                    if table.name not in statements:
+                        statements[table.name] = self._driver_statement(table, columns)
+                    sql, params = statements[table.name]
+                    conn.exec_driver_sql(sql, [params(row) for row in table_rows])
+                if on_chunk is not None:
+                    on_chunk(conn, chunk)
+            db_time += time.perf_counter() - chunk_start
+            stats['rows'] += len(chunk)
+            stats['chunks'] += 1
+
+        stats['elapsed'] = round(time.perf_counter() - start, 3)
+        stats['rows_per_sec'] = round(stats['rows'] / db_time) if db_time > 0 else 0
+        return stats
@@ -0,0 +1,247 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, exists, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class InsufficientBalanceError(ValueError):
+    """مانده کمیسیون برای برداشت کافی نیست"""
+
+
+class CommissionLedger:
+    """دفتر کمیسیون فقط-افزودنی با مانده جاری
+
+    هر ردیف (opening, earn, withdrawal, payout) مبلغ علامت‌دار و مانده بعد از خودش
+    را دارد. ردیف commission_balances هر فروشنده سر دفتر است: هر افزودن اول آن را
+    با یک UPDATE قفل می‌کند، پس افزودن‌های همزمان یک فروشنده پشت سر هم اجرا
+    می‌شوند و مانده‌ها هیچ‌وقت از هم جا نمی‌مانند. snapshotهای دوره‌ای مانده در
+    یک زمان را بدون مرور کل دفتر می‌دهند.
+    """
+
+    def __init__(self, entries, balances, snapshots, commissions):
+        self.entries = entries
+        self.balances = balances
+        self.snapshots = snapshots
+        self.commissions = commissions
+
+    def _insert_head(self, session):
+        """INSERT سر دفتر که اگر ردیف فروشنده از قبل (یا همزمان) ساخته شده باشد کاری نمی‌کند"""
+        dialect = (getattr(session, 'dialect', None) or session.get_bind().dialect).name
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            return module.insert(self.balances).on_conflict_do_nothing(index_elements=['seller_id'])
+        if dialect == 'mysql':
+            return insert(self.balances).prefix_with('IGNORE')
+        return insert(self.balances)
+
+    def _lock(self, session, seller_id):
+        """قفل سر دفتر فروشنده (UPDATE بی‌اثر) و خواندن مانده فعلی
+
+        اولین افزودن فروشنده سر دفتر را با insert-or-ignore می‌سازد و بعد همان UPDATE
+        قفل را اجرا می‌کند، پس دو برداشت همزمان اول هر دو پشت قفل یک ردیف می‌مانند.
+        """
+        balances = self.balances
+        lock = update(balances).where(balances.c.seller_id == seller_id).values(balance=balances.c.balance)
+        if session.execute(lock).rowcount == 0:
+            session.execute(self._insert_head(session).values(seller_id=seller_id, balance=0, updated_at=datetime.utcnow()))
+            session.execute(lock)
+        return session.execute(select(balances.c.balance).where(balances.c.seller_id == seller_id)).scalar()
+
+    def _append(self, session, seller_id, balance, items):
+        """افزودن ردیف‌ها [(نوع، مبلغ، reference_id)] پشت سر مانده balance؛ خروجی: مانده نهایی"""
+        now = datetime.utcnow()
+        rows = []
+        for entry_type, amount, reference_id in items:
+            balance += amount
+            rows.append({
+                'seller_id': seller_id,
+                'entry_type': entry_type,
+                'amount': amount,
+                'balance': balance,
+                'reference_id': reference_id,
+                'created_at': now
+            })
+        if session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            last_entry_id = session.execute(
+                insert(self.entries).returning(self.entries.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()[-1]
+        else:
+            # بدون RETURNING (MySQL): شناسه آخرین ردیف از lastrowid درج جداگانه آن
+            if len(rows) > 1:
+                session.execute(insert(self.entries), rows[:-1])
+            last_entry_id = session.execute(insert(self.entries), rows[-1]).inserted_primary_key[0]
+        session.execute(
+            update(self.balances).where(self.balances.c.seller_id == seller_id)
+            .values(balance=balance, last_entry_id=last_entry_id, updated_at=now)
+        )
+        return balance
+
+    def earn(self, session, seller_id, commissions):
+        """ثبت کمیسیون فروش‌ها [(transaction_id، مبلغ)]؛ خروجی: مانده جدید"""
+        if not commissions:
+            return self.balance(session, seller_id)
+        balance = self._lock(session, seller_id)
+        return self._append(session, seller_id, balance, [
+            ('earn', amount, transaction_id) for transaction_id, amount in commissions
+        ])
+
+    def withdraw(self, session, seller_id, amount, withdrawal_id):
+        """کسر درخواست تسویه از مانده؛ InsufficientBalanceError اگر مانده کافی نباشد"""
+        balance = self._lock(session, seller_id)
+        if amount > balance:
+            raise InsufficientBalanceError(balance)
+        return self._append(session, seller_id, balance, [('withdrawal', -amount, withdrawal_id)])
+
+    def payout(self, session, seller_id):
+        """پرداخت کل مانده فعلی به فروشنده؛ خروجی: مبلغ پرداخت شده"""
+        balance = self._lock(session, seller_id)
+        if balance <= 0:
+            return 0
+        self._append(session, seller_id, balance, [('payout', -balance, None)])
+        return balance
+
+    def balance(self, session, seller_id):
+        """مانده فعلی با یک خواندن کلید اصلی"""
+        balances = self.balances
+        return session.execute(
+            select(balances.c.balance).where(balances.c.seller_id == seller_id)
+        ).scalar() or 0
+
+    def balance_at(self, session, seller_id, at):
+        """مانده فروشنده در زمان at: آخرین snapshot قبل از at و ردیف‌های بعد از آن
+
+        هر دو کوئری روی ایندکس (seller_id, created_at) / (seller_id, taken_at) از at به
+        عقب می‌خوانند؛ ردیف‌های بعد از snapshot از زمان ردیف آخر آن به بعد جستجو می‌شوند.
+        """
+        entries, snapshots = self.entries, self.snapshots
+        snapshot = session.execute(
+            select(snapshots.c.entry_id, snapshots.c.balance, entries.c.created_at)
+            .select_from(snapshots.outerjoin(entries, entries.c.id == snapshots.c.entry_id))
+            .where(snapshots.c.seller_id == seller_id, snapshots.c.taken_at <= at)
+            .order_by(snapshots.c.taken_at.desc())
+            .limit(1)
+        ).first()
+
+        # ردیف‌های یک افزودن گروهی created_at یکسان دارند؛ id ترتیب آن‌ها را مشخص می‌کند
+        statement = select(entries.c.balance)\
+            .where(entries.c.seller_id == seller_id, entries.c.created_at <= at)\
+            .order_by(entries.c.created_at.desc(), entries.c.id.desc())\
+            .limit(1)
+        if snapshot is not None:
+            statement = statement.where(entries.c.id > snapshot.entry_id)
+            if snapshot.created_at is not None:
+                statement = statement.where(entries.c.created_at >= snapshot.created_at)
+        balance = session.execute(statement).scalar()
+        if balance is not None:
+            return balance
+        return snapshot.balance if snapshot is not None else 0
+
+    def snapshot(self, session):
+        """ثبت مانده فعلی فروشندگانی که از آخرین snapshot تغییر کرده‌اند؛ خروجی: تعداد"""
+        balances, snapshots = self.balances, self.snapshots
+        unchanged = exists().where(
+            snapshots.c.seller_id == balances.c.seller_id,
+            snapshots.c.entry_id == balances.c.last_entry_id
+        )
+        result = session.execute(insert(snapshots).from_select(
+            ['seller_id', 'entry_id', 'balance', 'taken_at'],
+            select(balances.c.seller_id, balances.c.last_entry_id, balances.c.balance, literal(datetime.utcnow()))
+            .where(balances.c.last_entry_id.isnot(None), ~unchanged)
+        ))
+        return result.rowcount
+
+    def open_missing(self, session):
+        """باز کردن دفتر فروشندگانی که کمیسیون pending دارند ولی هنوز در دفتر نیستند
+
+        مانده افتتاحیه مجموع کمیسیون‌های pending است (همان مانده قبل از وجود دفتر).
+        """
+        commissions, balances = self.commissions, self.balances
+        opening = session.execute(
+            select(commissions.c.seller_id, func.sum(commissions.c.amount))
+            .where(
+                commissions.c.status == 'pending',
+                ~exists().where(balances.c.seller_id == commissions.c.seller_id)
+            )
+            .group_by(commissions.c.seller_id)
+        ).all()
+        for seller_id, amount in opening:
+            balance = self._lock(session, seller_id)
+            self._append(session, seller_id, balance, [('opening', amount, None)])
+        return len(opening)
+
+    def verify(self, session, seller_id):
+        """بررسی پیوستگی مانده‌های جاری فروشنده؛ خروجی: لیست id ردیف‌های ناسازگار"""
+        entries = self.entries
+        broken = []
+        previous = 0
+        for entry_id, amount, balance in session.execute(
+            select(entries.c.id, entries.c.amount, entries.c.balance)
+            .where(entries.c.seller_id == seller_id)
+            .order_by(entries.c.id)
+        ):
+            if balance != previous + amount:
+                broken.append(entry_id)
+            previous = balance
+        if previous != self.balance(session, seller_id):
+            broken.append(None)
+        return broken
+
+
+def benchmark_concurrent_ledger(app, ledger, seller_id=-1, threads=8, operations=50, earn=10, withdrawal=15):
+    """کسب کمیسیون و برداشت همزمان از چند thread روی یک فروشنده موقت و بررسی مانده‌ها
+
+    ردیف‌های فروشنده موقت در پایان پاک می‌شوند. خروجی: تعداد عملیات، برداشت‌های رد
+    شده، ناسازگاری‌های دفتر و مانده نهایی در برابر مقدار مورد انتظار
+    """
+    db = app.extensions['sqlalchemy']
+    counts = {'earn': 0, 'withdrawal': 0, 'rejected': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+
+    def work(index):
+        with app.app_context():
+            for step in range(operations):
+                kind = 'withdrawal' if (index + step) % 2 else 'earn'
+                try:
+                    if kind == 'earn':
+                        ledger.earn(db.session, seller_id, [(None, earn)])
+                    else:
+                        ledger.withdraw(db.session, seller_id, withdrawal, None)
+                    db.session.commit()
+                except InsufficientBalanceError:
+                    db.session.rollback()
+                    kind = 'rejected'
+                except Exception:
+                    db.session.rollback()
+                    kind = 'errors'
+                with counts_lock:
+                    counts[kind] += 1
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        broken = ledger.verify(db.session, seller_id)
+        final_balance = ledger.balance(db.session, seller_id)
+        minimum = db.session.execute(
+            select(func.min(ledger.entries.c.balance)).where(ledger.entries.c.seller_id == seller_id)
+        ).scalar()
+        for table in (ledger.entries, ledger.balances, ledger.snapshots):
+            db.session.execute(delete(table).where(table.c.seller_id == seller_id))
+        db.session.commit()
+
+    operations_done = counts['earn'] + counts['withdrawal']
+    return {
+        **counts,
+        'broken_entries': len(broken),
+        'final_balance': final_balance,
+        'expected_balance': counts['earn'] * earn - counts['withdrawal'] * withdrawal,
+        'min_balance': minimum,
+        'operations_per_sec': round(operations_done / elapsed) if elapsed > 0 else 0
+    }
@@ -1,10 +1,11 @@
-from app import db
+from app import app, apply_usage_retention, db
 from sqlalchemy import text
-import time
 
 class DatabaseOptimizer:
-    def __init__(self):
+    def __init__(self, retention=None):
         self.optimization_stats = {}
+        # تابع نگهداری لاگ‌های مصرف: retention(days) -> (حذف شده‌ها، تعداد ردیف‌ها)
+        self.retention = retention
     
     def analyze_queries(self):
         """تحلیل کوئری‌های دیتابیس"""
@@ -35,9 +36,18 @@ class DatabaseOptimizer:
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_accounts_seller ON accounts(seller_id)",
             "CREATE INDEX IF NOT EXISTS idx_accounts_status ON accounts(status)",
+            "CREATE INDEX IF NOT EXISTS ix_import_jobs_content_hash ON import_jobs(content_hash)",
             "CREATE INDEX IF NOT EXISTS idx_customers_account ON customers(account_id)",
             "CREATE INDEX IF NOT EXISTS idx_transactions_seller ON transactions(seller_id)",
             "CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_seller_created ON transactions(seller_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_commission_ledger_seller ON commission_ledger(seller_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_commission_ledger_seller_created ON commission_ledger(seller_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_commission_snapshots_seller_taken ON commission_balance_snapshots(seller_id, taken_at)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_target ON notifications(target_type, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_expires ON notifications(expires_at)",
+            "CREATE INDEX IF NOT EXISTS idx_user_notifications_notification ON user_notifications(notification_id)",
+            "CREATE INDEX IF NOT EXISTS idx_user_notifications_unread ON user_notifications(user_type, user_id, is_read)",
             "CREATE INDEX IF NOT EXISTS idx_usage_logs_account ON usage_logs(account_id)",
             "CREATE INDEX IF NOT EXISTS idx_usage_logs_date ON usage_logs(date)"
         ]
@@ -62,18 +72,25 @@ class DatabaseOptimizer:
         except Exception as e:
             print(f"خطا در فشرده‌سازی: {e}")
     
-    def cleanup_old_data(self, days_old=90):
-        """پاک کردن داده‌های قدیمی"""
+    def cleanup_old_data(self, days_old=None, retention=None):
+        """پاک کردن داده‌های قدیمی با تابع نگهداری داده شده (مثلاً app.apply_usage_retention)
+
+        days_old پیش‌فرض USAGE_LOG_RETENTION_DAYS است.
+        """
+        retention = retention or self.retention
+        if retention is None:
+            print("تابع نگهداری داده‌ها تعیین نشده است")
+            return
+        if days_old is None:
+            days_old = app.config['USAGE_LOG_RETENTION_DAYS']
         print(f"در حال پاک کردن داده‌های قدیمی ({days_old} روز)...")
         
-        # این بخش باید با توجه به نیاز واقعی پیاده‌سازی شود
-        # مثال: پاک کردن لاگ‌های قدیمی
         try:
-            # حذف لاگ‌های قدیمی از ۹۰ روز قبل
-            old_date = time.time() - (days_old * 24 * 60 * 60)
-            # اینجا کوئری حذف داده‌های قدیمی قرار می‌گیرد
-            print("داده‌های قدیمی پاک شدند")
+            # لاگ‌های مصرف: حذف کامل پارتیشن‌های ماهانه قدیمی (بدون DELETE ردیف به ردیف)
+            dropped, removed = retention(days_old)
+            print(f"داده‌های قدیمی پاک شدند: {len(dropped)} پارتیشن، {removed} ردیف")
         except Exception as e:
+            db.session.rollback()
             print(f"خطا در پاک کردن داده‌های قدیمی: {e}")
     
     def get_database_stats(self):
@@ -102,8 +119,8 @@ class DatabaseOptimizer:
         
         return stats
 
-# ایجاد نمونه بهینه‌ساز دیتابیس
-db_optimizer = DatabaseOptimizer()
+# ایجاد نمونه بهینه‌ساز دیتابیس (پاکسازی لاگ‌های مصرف با دوره نگهداری برنامه)
+db_optimizer = DatabaseOptimizer(retention=apply_usage_retention)
 
 def optimize_database():
     """بهینه‌سازی کامل دیتابیس"""
@@ -0,0 +1,250 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from flask import Response
+
+from utils.query_counter import QueryCounter
+
+try:
+    import redis
+except ImportError:  # redis فقط برای استقرار چند پروسسی لازم است
+    redis = None
+
+
+def redis_broker(url):
+    """کلاینت redis برای EventHub از روی url (None اگر url داده نشده باشد)"""
+    if not url:
+        return None
+    if redis is None:
+        raise RuntimeError('EVENT_HUB_REDIS_URL تنظیم شده ولی پکیج redis نصب نیست')
+    return redis.Redis.from_url(url)
+
+
+class Subscription:
+    """اتصال یک کلاینت: کانال‌ها و صف پیام‌های در انتظار ارسال"""
+
+    def __init__(self, channels, max_queue=100):
+        self.channels = tuple(channels)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def put(self, message):
+        # کلاینت کند نباید منتشرکننده را معطل کند؛ پیام‌های اضافه دور ریخته می‌شوند
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventHub:
+    """pub/sub برای ارسال رویدادها به اتصال‌های SSE
+
+    هر رویداد یک بار سریال می‌شود و در صف همه مشترکین کانال‌های آن قرار
+    می‌گیرد؛ کلاینت‌ها برای دریافت تغییرات دیگر به دیتابیس درخواست نمی‌زنند.
+    بدون broker مشترکین فقط در همین پروسس هستند. با broker (کلاینت redis) رویداد
+    روی کانال‌های redis منتشر می‌شود و یک thread در هر پروسس کانال‌هایی را که
+    اتصال محلی دارند subscribe می‌کند، پس همه workerهای gunicorn رویداد را می‌گیرند.
+    """
+
+    def __init__(self, dumps=None, max_queue=100, broker=None, prefix='hams:events:', poll_interval=0.5):
+        self.dumps = dumps or (lambda obj: json.dumps(obj, ensure_ascii=False, default=str))
+        self.max_queue = max_queue
+        self.broker = broker
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+        self._listener = None
+        # شناسه پیام‌های تحویل شده؛ پیامی که به چند کانال منتشر شده یک بار تحویل می‌شود
+        self._seen = OrderedDict()
+
+    @property
+    def client_count(self):
+        """تعداد اتصال‌های باز همین پروسس"""
+        with self._lock:
+            return len(set().union(*self._channels.values()))
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, self.max_queue)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels[channel].add(subscription)
+            if self.broker is not None and self._listener is None:
+                # thread بعد از fork شدن worker و با اولین اتصال ساخته می‌شود
+                self._listener = threading.Thread(target=self._listen, name='event-hub-listener', daemon=True)
+                self._listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def has_subscribers(self, channels):
+        """آیا کسی به این کانال‌ها گوش می‌دهد (برای پرهیز از ساخت payload بی‌مصرف)"""
+        if self.broker is not None:
+            counts = self.broker.pubsub_numsub(*(self.prefix + channel for channel in channels))
+            return any(count for _, count in counts)
+        with self._lock:
+            return any(self._channels.get(channel) for channel in channels)
+
+    def publish(self, channels, event, data):
+        """ارسال رویداد به مشترکین کانال‌ها
+
+        خروجی: تعداد اتصال‌های گیرنده، یا با broker تعداد پروسس‌های گیرنده به ازای هر کانال
+        """
+        channels = list(channels)
+        if self.broker is None:
+            return self._deliver(channels, f'event: {event}\ndata: {self.dumps(data)}\n\n')
+
+        envelope = '\n'.join((uuid.uuid4().hex, ','.join(channels), f'event: {event}\ndata: {self.dumps(data)}\n\n'))
+        pipeline = self.broker.pipeline(transaction=False)
+        for channel in channels:
+            pipeline.publish(self.prefix + channel, envelope)
+        return sum(pipeline.execute())
+
+    def _deliver(self, channels, message):
+        with self._lock:
+            subscribers = set().union(*(self._channels.get(channel, ()) for channel in channels))
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+    def _receive(self, envelope):
+        """تحویل پیام رسیده از redis به اتصال‌های محلی (هر شناسه پیام یک بار)"""
+        if isinstance(envelope, bytes):
+            envelope = envelope.decode('utf-8')
+        message_id, channels, message = envelope.split('\n', 2)
+        if message_id in self._seen:
+            return
+        self._seen[message_id] = True
+        if len(self._seen) > 1000:
+            self._seen.popitem(last=False)
+        self._deliver(channels.split(','), message)
+
+    def _listen(self):
+        """thread دریافت از redis؛ کانال‌های subscribe شده را با اتصال‌های محلی هماهنگ نگه می‌دارد"""
+        pubsub, subscribed = None, set()
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub, subscribed = self.broker.pubsub(ignore_subscribe_messages=True), set()
+                with self._lock:
+                    wanted = {self.prefix + channel for channel in self._channels}
+                if wanted - subscribed:
+                    pubsub.subscribe(*(wanted - subscribed))
+                if subscribed - wanted:
+                    pubsub.unsubscribe(*(subscribed - wanted))
+                subscribed = wanted
+                if not subscribed:
+                    time.sleep(self.poll_interval)
+                    continue
+                message = pubsub.get_message(timeout=self.poll_interval)
+                while message is not None:
+                    if message['type'] == 'message':
+                        self._receive(message['data'])
+                    message = pubsub.get_message()
+            except Exception as e:
+                print(f"Error in event hub listener: {e}")
+                if pubsub is not None:
+                    pubsub.close()
+                pubsub = None
+                time.sleep(1)
+
+    def stream(self, channels, heartbeat=15, max_age=None):
+        """generator متن SSE برای یک اتصال
+
+        اشتراک داخل generator ساخته می‌شود، پس پاسخی که هرگز ارسال نشود اشتراکی باقی
+        نمی‌گذارد، و با بسته شدن اتصال حذف می‌شود. با max_age (ثانیه) اتصال بعد از این
+        مدت بسته می‌شود تا thread سرور آزاد شود؛ مرورگر بعد از retry دوباره وصل می‌شود.
+        """
+        subscription = self.subscribe(channels)
+        deadline = time.monotonic() + max_age if max_age else None
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                timeout = heartbeat
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        return
+                try:
+                    yield subscription.queue.get(timeout=timeout)
+                except queue.Empty:
+                    # پیام keep-alive تا proxyها اتصال بیکار را نبندند
+                    yield ': ping\n\n'
+        finally:
+            self.unsubscribe(subscription)
+
+
+def sse_response(hub, channels, heartbeat=15, max_age=None):
+    """پاسخ text/event-stream برای کانال‌های داده شده"""
+    return Response(
+        hub.stream(channels, heartbeat=heartbeat, max_age=max_age),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def benchmark_push_vs_poll(app, hub, poll_path, stream_path, channels, event, clients=5000, events=10,
+                           poll_interval=30, window=300, timeout=5):
+    """مقایسه تعداد کوئری دیتابیس: polling در برابر push با clients کلاینت متصل
+
+    polling: کوئری‌های یک درخواست poll_path ضربدر تعداد pollهای همه کلاینت‌ها در window ثانیه
+    push: clients اتصال واقعی به stream_path از طریق test client باز می‌شود، events
+    رویداد منتشر و متن SSE دریافتی هر اتصال خوانده می‌شود؛ کوئری‌های اجرا شده در این
+    مدت شمرده و بعد از بستن اتصال‌ها باقی ماندن اشتراک‌ها بررسی می‌شود.
+    """
+    engine = app.extensions['sqlalchemy'].engine
+    client = app.test_client()
+
+    with QueryCounter(engine) as counter:
+        payload = client.get(poll_path).get_json()
+    queries_per_poll = counter.count
+    polls = clients * (window // poll_interval)
+
+    responses = [client.get(stream_path, buffered=False) for _ in range(clients)]
+    bodies = [iter(response.response) for response in responses]
+    for body in bodies:
+        next(body)  # retry؛ اشتراک با شروع خواندن پاسخ ساخته می‌شود
+
+    # با broker تا subscribe شدن کانال‌ها توسط thread دریافت صبر می‌شود
+    waited = time.monotonic() + timeout
+    while not hub.has_subscribers(channels) and time.monotonic() < waited:
+        time.sleep(0.05)
+
+    start = time.perf_counter()
+    delivered = 0
+    marker = f'event: {event}\n'.encode('utf-8')
+    with QueryCounter(engine) as counter:
+        for _ in range(events):
+            hub.publish(channels, event, payload)
+            for body in bodies:
+                chunk = next(body)
+                while chunk.startswith(b':'):  # keep-alive
+                    chunk = next(body)
+                if chunk.startswith(marker):
+                    delivered += 1
+    elapsed = time.perf_counter() - start
+
+    for response in responses:
+        response.close()
+
+    return {
+        'clients': clients,
+        'poll_requests': polls,
+        'poll_queries': polls * queries_per_poll,
+        'push_events': events,
+        'push_deliveries': delivered,
+        'push_queries': counter.count,
+        'deliveries_per_sec': round(delivered / elapsed) if elapsed > 0 else 0,
+        'open_streams_after': hub.client_count
+    }
@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import false, func, insert, literal, select
+
+
+class NotificationFanout:
+    """ایجاد ردیف‌های user_notifications با یک INSERT ... SELECT برای هر نوع گیرنده
+
+    به جای بارگذاری همه فروشندگان/مشتریان در حافظه و ساخت یک شیء ORM برای هر
+    گیرنده، دیتابیس ردیف‌ها را مستقیماً از جدول کاربران می‌سازد.
+    """
+
+    def __init__(self, user_notifications, sellers, customers):
+        self.user_notifications = user_notifications
+        # نوع کاربر -> جدول کاربران
+        self.audiences = {'seller': sellers, 'customer': customers}
+
+    def user_types(self, target_type):
+        """انواع کاربرانی که یک نوع هدف شامل آن‌ها می‌شود"""
+        if target_type == 'sellers':
+            return ['seller']
+        if target_type == 'customers':
+            return ['customer']
+        return ['seller', 'customer']
+
+    def audience_size(self, session, target_type):
+        """تعداد گیرندگان یک نوع هدف"""
+        return sum(
+            session.execute(select(func.count()).select_from(self.audiences[user_type])).scalar() or 0
+            for user_type in self.user_types(target_type)
+        )
+
+    def fan_out(self, session, notification_id, target_type):
+        """ساخت ردیف اعلان برای همه گیرندگان؛ خروجی: آمار تعداد و سرعت"""
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        recipients = 0
+        columns = ['user_id', 'user_type', 'notification_id', 'is_read', 'created_at']
+
+        for user_type in self.user_types(target_type):
+            users = self.audiences[user_type]
+            result = session.execute(
+                insert(self.user_notifications).from_select(columns, select(
+                    users.c.id,
+                    literal(user_type),
+                    literal(notification_id),
+                    false(),
+                    literal(now)
+                ))
+            )
+            recipients += result.rowcount
+
+        elapsed = time.perf_counter() - start
+        return {
+            'recipients': recipients,
+            'elapsed': round(elapsed, 3),
+            'recipients_per_sec': round(recipients / elapsed) if elapsed > 0 else 0
+        }
@@ -0,0 +1,206 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    and_, delete, exists, false, func, insert, literal, literal_column, null, or_, select, true, union_all, update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class NotificationInbox:
+    """صندوق اعلان کاربران با اعلان‌های همگانی تنبل
+
+    اعلان‌های همگانی (target_type در lazy_targets) فقط یک ردیف در notifications
+    دارند. ردیف user_notifications فقط وقتی ساخته می‌شود که کاربر اعلان را
+    بخواند یا کنار بگذارد، و لیست اعلان‌ها هر دو را در یک کوئری ادغام می‌کند.
+    user_notifications باید کلید یکتای (user_type, user_id, notification_id) داشته
+    باشد تا ساخت هم‌زمان یک ردیف به ردیف تکراری نرسد.
+    """
+
+    KEY_COLUMNS = ('user_type', 'user_id', 'notification_id')
+
+    # نوع هدف -> انواع کاربرانی که شامل آن می‌شوند
+    TARGET_USER_TYPES = {
+        'all': ('seller', 'customer'),
+        'sellers': ('seller',),
+        'customers': ('customer',),
+    }
+
+    def __init__(self, notifications, user_notifications, serializer, lazy_targets=('all',)):
+        self.notifications = notifications
+        self.user_notifications = user_notifications
+        self.serializer = serializer
+        self.lazy_targets = tuple(lazy_targets)
+
+    def is_lazy(self, target_type):
+        """آیا اعلان با این نوع هدف به صورت تنبل (بدون ردیف برای هر کاربر) ارسال می‌شود"""
+        return target_type in self.lazy_targets
+
+    def broadcast_targets(self, user_type):
+        """نوع‌های هدف تنبلی که شامل این نوع کاربر می‌شوند"""
+        return [
+            target for target in self.lazy_targets
+            if user_type in self.TARGET_USER_TYPES.get(target, ())
+        ]
+
+    def _user_match(self, user_type, user_id):
+        un = self.user_notifications
+        return and_(un.c.user_type == user_type, un.c.user_id == user_id)
+
+    def _live(self):
+        """شرط اعلان‌های منقضی نشده"""
+        n = self.notifications
+        return or_(n.c.expires_at.is_(None), n.c.expires_at > datetime.utcnow())
+
+    def _pending_broadcasts(self, user_type, user_id):
+        """شرط اعلان‌های همگانی که هنوز برای این کاربر ردیفی ندارند (None اگر نوع هدف تنبلی نباشد)"""
+        targets = self.broadcast_targets(user_type)
+        if not targets:
+            return None
+        n, un = self.notifications, self.user_notifications
+        return and_(
+            n.c.target_type.in_(targets),
+            self._live(),
+            ~exists().where(self._user_match(user_type, user_id), un.c.notification_id == n.c.id)
+        )
+
+    def statement(self, user_type, user_id):
+        """کوئری ادغام ردیف‌های کاربر با اعلان‌های همگانی هنوز ساخته نشده"""
+        n, un = self.notifications, self.user_notifications
+        columns = self.serializer.columns
+
+        # اعلان‌هایی که برای کاربر ردیف دارند (ارسال مستقیم یا همگانی خوانده شده)
+        own = select(*columns, un.c.is_read, un.c.id)\
+            .select_from(un.join(n, n.c.id == un.c.notification_id))\
+            .where(self._user_match(user_type, user_id), self._not_dismissed(), self._live())
+
+        pending = self._pending_broadcasts(user_type, user_id)
+        if pending is None:
+            return own.order_by(n.c.created_at.desc())
+
+        # اعلان‌های همگانی که هنوز برای این کاربر ردیفی ندارند
+        broadcasts = select(*columns, false(), null()).where(pending)
+        return union_all(own, broadcasts).order_by(literal_column('created_at').desc())
+
+    def _insert_missing(self, session):
+        """INSERT روی user_notifications که ردیف موجود با همان کلید را نادیده می‌گیرد"""
+        dialect = (getattr(session, 'dialect', None) or session.get_bind().dialect).name
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            return module.insert(self.user_notifications).on_conflict_do_nothing(index_elements=list(self.KEY_COLUMNS))
+        if dialect == 'mysql':
+            return insert(self.user_notifications).prefix_with('IGNORE')
+        return insert(self.user_notifications)
+
+    def _not_dismissed(self):
+        un = self.user_notifications
+        return or_(un.c.is_dismissed.is_(None), un.c.is_dismissed == false())
+
+    def list(self, session, user_type, user_id):
+        """لیست اعلان‌های کاربر با وضعیت خوانده شدن"""
+        size = len(self.serializer.keys)
+        result = []
+        for row in session.execute(self.statement(user_type, user_id)):
+            item = self.serializer.serialize(row[:size])
+            item['is_read'] = bool(row[size])
+            item['user_notification_id'] = row[size + 1]
+            result.append(item)
+        return result
+
+    def unread_count(self, session, user_type, user_id):
+        """تعداد اعلان‌های خوانده نشده کاربر در یک کوئری (ایندکس user_type, user_id, is_read)"""
+        n, un = self.notifications, self.user_notifications
+        own = select(func.count())\
+            .select_from(un.join(n, n.c.id == un.c.notification_id))\
+            .where(
+                self._user_match(user_type, user_id),
+                or_(un.c.is_read.is_(None), un.c.is_read == false()),
+                self._not_dismissed(),
+                self._live()
+            ).scalar_subquery()
+
+        pending = self._pending_broadcasts(user_type, user_id)
+        if pending is None:
+            return session.execute(select(own)).scalar()
+        broadcasts = select(func.count()).select_from(n).where(pending).scalar_subquery()
+        return session.execute(select(own + broadcasts)).scalar()
+
+    def mark_read(self, session, user_type, user_id, notification_ids=None):
+        """علامت‌گذاری گروهی اعلان‌ها (یا همه اگر notification_ids None باشد) به عنوان خوانده شده
+
+        ردیف‌های موجود با یک UPDATE و اعلان‌های همگانی بدون ردیف با یک
+        INSERT ... SELECT به حالت خوانده شده می‌روند. خروجی: تعداد اعلان‌های تغییر کرده
+        """
+        n, un = self.notifications, self.user_notifications
+        now = datetime.utcnow()
+
+        statement = update(un).where(
+            self._user_match(user_type, user_id),
+            or_(un.c.is_read.is_(None), un.c.is_read == false())
+        )
+        if notification_ids is not None:
+            statement = statement.where(un.c.notification_id.in_(notification_ids))
+        changed = session.execute(statement.values(is_read=True, read_at=now)).rowcount
+
+        pending = self._pending_broadcasts(user_type, user_id)
+        if pending is not None:
+            broadcasts = select(
+                literal(user_id), literal(user_type), n.c.id, true(), literal(now), literal(now)
+            ).where(pending)
+            if notification_ids is not None:
+                broadcasts = broadcasts.where(n.c.id.in_(notification_ids))
+            changed += session.execute(self._insert_missing(session).from_select(
+                ['user_id', 'user_type', 'notification_id', 'is_read', 'read_at', 'created_at'], broadcasts
+            )).rowcount
+        return changed
+
+    def is_broadcast_for(self, session, notification_id, user_type):
+        """آیا اعلان یک اعلان همگانی تنبل برای این نوع کاربر است"""
+        targets = self.broadcast_targets(user_type)
+        if not targets:
+            return False
+        n = self.notifications
+        return session.execute(
+            select(n.c.id).where(n.c.id == notification_id, n.c.target_type.in_(targets), self._live())
+        ).first() is not None
+
+    def materialize(self, session, model, notification_id, user_type, user_id):
+        """ردیف وضعیت کاربر برای یک اعلان؛ برای اعلان همگانی در صورت نیاز ساخته می‌شود
+
+        ردیف با INSERT ... ON CONFLICT DO NOTHING ساخته و سپس خوانده می‌شود، پس
+        درخواست‌های هم‌زمان خواندن/کنار گذاشتن همان اعلان یک ردیف مشترک می‌گیرند.
+        """
+        key = {'user_id': user_id, 'user_type': user_type, 'notification_id': notification_id}
+        user_notif = session.query(model).filter_by(**key).first()
+        if user_notif is None and self.is_broadcast_for(session, notification_id, user_type):
+            session.execute(self._insert_missing(session).values(
+                **key, is_read=False, is_dismissed=False, created_at=datetime.utcnow()
+            ))
+            user_notif = session.query(model).filter_by(**key).first()
+        return user_notif
+
+    def purge_expired(self, session, batch_size=1000):
+        """حذف اعلان‌های منقضی شده و ردیف‌های کاربران آن‌ها در دسته‌های محدود
+
+        هر دسته در تراکنش جداگانه commit می‌شود تا قفل‌ها کوتاه بمانند. خروجی: تعداد اعلان‌های حذف شده
+        """
+        n, un = self.notifications, self.user_notifications
+        now = datetime.utcnow()
+        removed = 0
+        while True:
+            ids = session.execute(
+                select(n.c.id).where(n.c.expires_at <= now).order_by(n.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return removed
+
+            # ردیف‌های کاربران هم در دسته‌های محدود (یک اعلان گروهی ممکن است هزاران ردیف داشته باشد)
+            while True:
+                batch = select(un.c.id).where(un.c.notification_id.in_(ids)).limit(batch_size)
+                deleted = session.execute(delete(un).where(un.c.id.in_(batch))).rowcount
+                session.commit()
+                if deleted < batch_size:
+                    break
+
+            session.execute(delete(n).where(n.c.id.in_(ids)))
+            session.commit()
+            removed += len(ids)
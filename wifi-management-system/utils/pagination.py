@@ -0,0 +1,41 @@
+from flask import Response, current_app, stream_with_context
+
+
+def get_keyset_args(args, default_limit=100, max_limit=1000):
+    """خواندن پارامترهای limit و after از query string (ValueError برای ورودی نامعتبر)"""
+    limit = int(args.get('limit', default_limit))
+    after = int(args.get('after', 0))
+    if limit < 1 or after < 0:
+        raise ValueError('limit/after')
+    return min(limit, max_limit), after
+
+
+def keyset_page(session, statement, id_column, after=0, limit=100):
+    """یک صفحه از نتایج یک select با صفحه‌بندی keyset روی id
+
+    به جای OFFSET از شرط id > after استفاده می‌شود تا هزینه هر صفحه مستقل از
+    موقعیت آن باشد. statement باید id_column را با همان نام ستون برگرداند.
+    خروجی: (ردیف‌های صفحه، مقدار after صفحه بعد یا None)
+    """
+    rows = session.execute(
+        statement.where(id_column > after).order_by(id_column).limit(limit + 1)
+    ).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]._mapping[id_column.key]
+    return rows, None
+
+
+def ndjson_response(session, statement, id_column, serialize, after=0, batch_size=1000):
+    """پاسخ جریانی NDJSON: هر ردیف یک خط JSON، خوانده شده با cursor سمت سرور"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        result = session.execute(
+            statement.where(id_column > after).order_by(id_column)
+            .execution_options(yield_per=batch_size)
+        )
+        for row in result:
+            yield dumps(serialize(row)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,256 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+
+DEFAULT_TYPE_KEYWORDS = [
+    ('hi', 'Wfi'),  # hi و high
+    ('gb', 'GB'),
+    ('mb', 'MB'),
+]
+
+
+class VoucherFormat:
+    """قالب خطوط ووچر یک فروشنده
+
+    هر الگو گروه‌های نام‌دار user و password (و در صورت نیاز type) دارد و
+    بقیه گروه‌هایش بدون capture هستند.
+    patterns در یک alternation کامپایل می‌شوند؛ fallback_patterns فقط وقتی
+    امتحان می‌شوند که هیچ الگوی اصلی در خط پیدا نشود.
+    """
+
+    def __init__(self, name, patterns, fallback_patterns=(), type_keywords=None):
+        self.name = name
+        self.type_keywords = list(type_keywords or DEFAULT_TYPE_KEYWORDS)
+        self._regexes = [
+            regex for regex in (self._compile(patterns), self._compile(fallback_patterns))
+            if regex is not None
+        ]
+
+    @staticmethod
+    def _compile(patterns):
+        """ترکیب الگوها در یک عبارت منظم با گروه‌های user_i/password_i/type_i"""
+        if not patterns:
+            return None
+        parts = []
+        for i, pattern in enumerate(patterns):
+            compiled = re.compile(pattern)
+            if not {'user', 'password'} <= set(compiled.groupindex):
+                raise ValueError(f'الگوی {pattern!r} باید گروه‌های user و password داشته باشد')
+            if compiled.groups != len(compiled.groupindex):
+                raise ValueError(f'در الگوی {pattern!r} بقیه گروه‌ها باید (?:...) باشند')
+            # گروه type قبل از password بسته می‌شود تا lastgroup همیشه password_i باشد
+            if '(?P<type>' in pattern and pattern.index('(?P<type>') > pattern.index('(?P<password>'):
+                raise ValueError(f'در الگوی {pattern!r} گروه type باید قبل از password بیاید')
+            for group in ('user', 'password', 'type'):
+                pattern = pattern.replace(f'(?P<{group}>', f'(?P<{group}_{i}>')
+            parts.append(f'(?:{pattern})')
+        return re.compile('|'.join(parts), re.IGNORECASE)
+
+    def classify(self, line):
+        """تشخیص نوع اکانت از کلمات کلیدی خط (به ترتیب اولویت)"""
+        lower = line.lower()
+        for keyword, account_type in self.type_keywords:
+            if keyword in lower:
+                return account_type
+        return 'Unknown'
+
+    def match(self, line):
+        """استخراج نام کاربری، رمز و نوع از یک خط؛ None اگر خط ووچر نباشد"""
+        for regex in self._regexes:
+            m = regex.search(line)
+            if m is None:
+                continue
+            # lastgroup برابر password_i است و شماره الگوی منطبق را می‌دهد
+            i = m.lastgroup.rsplit('_', 1)[1]
+            account_type = m.group(f'type_{i}') if f'type_{i}' in regex.groupindex else None
+            return {
+                'username': m.group(f'user_{i}').strip(),
+                'password': m.group(f'password_{i}').strip(),
+                'account_type': account_type or self.classify(line),
+                'status': 'active'
+            }
+        return None
+
+
+# قالب‌های ووچر ثبت شده بر اساس نام فروشنده
+VOUCHER_FORMATS = {}
+
+
+def register_voucher_format(voucher_format):
+    """ثبت یا جایگزینی قالب ووچر یک فروشنده
+
+    ثبت باید هنگام import ماژول انجام شود تا در پروسس‌های کارگر هم موجود باشد.
+    """
+    VOUCHER_FORMATS[voucher_format.name] = voucher_format
+    return voucher_format
+
+
+def get_voucher_format(name=None):
+    """دریافت قالب ووچر ثبت شده (پیش‌فرض: default)"""
+    return VOUCHER_FORMATS.get(name or 'default')
+
+
+register_voucher_format(VoucherFormat(
+    'default',
+    patterns=[
+        r'User:\s*(?P<user>\w+)\s*Pass:\s*(?P<password>\w+)',
+        r'Username:\s*(?P<user>\w+)\s*Password:\s*(?P<password>\w+)',
+        r'(?P<user>\w+)@(?P<password>\w+)',
+    ],
+    fallback_patterns=[
+        r'(?P<user>\w+)\s+(?P<password>\w+)',  # الگوی ساده‌تر
+    ]
+))
+
+
+def parse_line(line, voucher_format=None):
+    """استخراج اکانت یک خط از متن PDF"""
+    account = (voucher_format or VOUCHER_FORMATS['default']).match(line)
+    return [account] if account else []
+
+
+def extract_page_range(pdf_path, start, end, voucher_format=None):
+    """استخراج اکانت‌های صفحات [start, end) - در پروسس کارگر اجرا می‌شود"""
+    match = (voucher_format or VOUCHER_FORMATS['default']).match
+    accounts = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:end]:
+            text = page.extract_text()
+            if text:
+                for line in text.split('\n'):
+                    account = match(line)
+                    if account:
+                        accounts.append(account)
+    return accounts
+
+
+class PDFExtractor:
+    def __init__(self, max_workers=None, pages_per_task=25):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        """ایجاد تنبل استخر پروسس‌ها (یک بار برای هر پروسس وب)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def shutdown(self):
+        """بستن استخر پروسس‌ها"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def page_count(self, pdf_path):
+        """تعداد صفحات فایل PDF"""
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+    def page_ranges(self, total_pages, start_page=0):
+        """تقسیم صفحات (از start_page) به بازه‌های pages_per_task تایی"""
+        return [
+            (start, min(start + self.pages_per_task, total_pages))
+            for start in range(start_page, total_pages, self.pages_per_task)
+        ]
+
+    def iter_ranges(self, pdf_path, total_pages=None, voucher_format=None, start_page=0):
+        """اکانت‌های هر بازه صفحه را به ترتیب صفحات برمی‌گرداند (ادامه از start_page)"""
+        if total_pages is None:
+            total_pages = self.page_count(pdf_path)
+        ranges = self.page_ranges(total_pages, start_page)
+
+        # برای فایل‌های کوچک هزینه ارسال به استخر ارزش ندارد
+        if self.max_workers <= 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                yield (start, end), extract_page_range(pdf_path, start, end, voucher_format)
+            return
+
+        # فقط تعداد محدودی وظیفه در جریان است تا نتایج در حافظه انباشته نشوند
+        pool = self._get_pool()
+        pending = deque()
+        for start, end in ranges:
+            pending.append(((start, end), pool.submit(extract_page_range, pdf_path, start, end, voucher_format)))
+            if len(pending) >= self.max_workers * 2:
+                page_range, future = pending.popleft()
+                yield page_range, future.result()
+        while pending:
+            page_range, future = pending.popleft()
+            yield page_range, future.result()
+
+    def iter_accounts(self, pdf_path, voucher_format=None):
+        """اکانت‌های استخراج شده به صورت جریانی و به ترتیب صفحات"""
+        for _, range_accounts in self.iter_ranges(pdf_path, voucher_format=voucher_format):
+            yield from range_accounts
+
+    def extract(self, pdf_path, voucher_format=None):
+        """استخراج موازی اکانت‌ها از همه صفحات PDF"""
+        accounts = []
+        try:
+            accounts.extend(self.iter_accounts(pdf_path, voucher_format))
+        except Exception as e:
+            print(f"Error extracting PDF: {e}")
+
+        return accounts
+
+
+def _legacy_parse_line(line):
+    """پیاده‌سازی قبلی (چهار re.findall کامپایل نشده در هر خط) - فقط برای مقایسه در بنچمارک"""
+    accounts = []
+    patterns = [
+        r'User:\s*(\w+)\s*Pass:\s*(\w+)',
+        r'Username:\s*(\w+)\s*Password:\s*(\w+)',
+        r'(\w+)@(\w+)',
+        r'(\w+)\s+(\w+)',
+    ]
+    for pattern in patterns:
+        for match in re.findall(pattern, line, re.IGNORECASE):
+            account_type = 'Unknown'
+            if 'hi' in line.lower() or 'high' in line.lower():
+                account_type = 'Wfi'
+            elif 'gb' in line.lower():
+                account_type = 'GB'
+            elif 'mb' in line.lower():
+                account_type = 'MB'
+            accounts.append({
+                'username': match[0].strip(),
+                'password': match[1].strip(),
+                'account_type': account_type,
+                'status': 'active'
+            })
+            break
+    return accounts
+
+
+def benchmark_line_parsing(lines=None, repeat=5):
+    """بنچمارک تعداد خط در ثانیه: روش قبلی در مقابل matcher کامپایل شده؛ خروجی: {روش: خط در ثانیه}"""
+    if lines is None:
+        kinds = ['5GB', 'high 10', '500MB', '']
+        lines = [
+            f"User: u{i:06d} Pass: p{i:06d} {kinds[i % 4]}" if i % 3 else f"Serial {i} - Hotspot voucher"
+            for i in range(20000)
+        ]
+
+    match = VOUCHER_FORMATS['default'].match
+    results = {}
+    for name, parse in (('legacy', _legacy_parse_line), ('compiled', match)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in lines:
+                parse(line)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = round(len(lines) / best)
+
+    results['speedup'] = round(results['compiled'] / results['legacy'], 2)
+    return results
@@ -0,0 +1,75 @@
+import functools
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+
+# شمارنده‌های فعال در هر thread
+_state = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_state, 'counters', ()):
+        counter.statements.append(statement)
+
+
+class QueryCounter:
+    """شمارش کوئری‌های اجرا شده روی یک engine در thread فعلی"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        if not hasattr(_state, 'counters'):
+            _state.counters = []
+        _state.counters.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _state.counters.remove(self)
+        return False
+
+
+class assert_max_queries(QueryCounter):
+    """خطای AssertionError اگر تعداد کوئری‌های بلوک از حد مجاز بیشتر شود (مثلاً بازگشت N+1)"""
+
+    def __init__(self, engine, limit):
+        super().__init__(engine)
+        self.limit = limit
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if exc_type is None and self.count > self.limit:
+            statements = '\n'.join(self.statements)
+            raise AssertionError(f'{self.count} کوئری اجرا شد (حداکثر مجاز {self.limit}):\n{statements}')
+        return False
+
+
+def query_budget(limit):
+    """دکوراتور سقف تعداد کوئری برای یک view
+
+    با QUERY_BUDGET_CHECKS (پیش‌فرض: حالت debug) تجاوز از سقف خطا می‌دهد و
+    در غیر این صورت فقط هشدار چاپ می‌شود.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            engine = current_app.extensions['sqlalchemy'].engine
+            with QueryCounter(engine) as counter:
+                result = func(*args, **kwargs)
+
+            if counter.count > limit:
+                message = f'{func.__name__}: {counter.count} کوئری اجرا شد (حداکثر مجاز {limit})'
+                if current_app.config.get('QUERY_BUDGET_CHECKS', current_app.debug):
+                    raise AssertionError(message)
+                print(f"Warning: {message}")
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+from sqlalchemy import delete, func, inspect, literal, select, text, tuple_, update
+
+
+def add_missing_columns(engine, tables):
+    """افزودن ستون‌های جدید مدل‌ها به جداول موجود
+
+    db.create_all فقط جدول‌های جدید را می‌سازد؛ این تابع ستون‌هایی را که بعداً به
+    مدل‌ها اضافه شده‌اند با ALTER TABLE ... ADD COLUMN به دیتابیس موجود اضافه می‌کند.
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    value = literal(column.default.arg, column.type).compile(
+                        dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+                    )
+                    ddl += f' DEFAULT {value}'
+                conn.execute(text(ddl))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def add_missing_indexes(engine, tables, prepare=None):
+    """ساخت ایندکس‌های تعریف شده در مدل‌ها که در جداول موجود نیستند
+
+    مثل add_missing_columns برای دیتابیس‌هایی که قبل از تعریف ایندکس ساخته شده‌اند.
+    prepare: {نام ایندکس: تابع(conn)} که در همان تراکنش قبل از ساخت ایندکس اجرا
+    می‌شود (مثلاً ادغام ردیف‌های تکراری قبل از ایندکس یکتا). خطای ساخت ایندکس با
+    RuntimeError گزارش می‌شود: کدی که به ایندکس یکتا تکیه دارد بدون آن درست کار نمی‌کند.
+    """
+    prepare = prepare or {}
+    inspector = inspect(engine)
+    created = []
+    for table in tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                with engine.begin() as conn:
+                    if index.name in prepare:
+                        prepare[index.name](conn)
+                    index.create(conn)
+            except Exception as e:
+                raise RuntimeError(f"Error creating index {index.name} on {table.name}: {e}") from e
+            created.append(index.name)
+    return created
+
+
+def drop_index(conn, table_name, index_name):
+    """حذف ایندکسی که دیگر در مدل‌ها تعریف نشده (اگر وجود داشته باشد)"""
+    if index_name not in {index['name'] for index in inspect(conn).get_indexes(table_name)}:
+        return False
+    ddl = f'DROP INDEX {index_name}'
+    if conn.dialect.name == 'mysql':
+        ddl += f' ON {table_name}'
+    conn.execute(text(ddl))
+    return True
+
+
+def merge_duplicate_rows(conn, table, key_columns, keep_order, batch_size=500):
+    """ادغام ردیف‌های تکراری table بر اساس key_columns؛ خروجی: تعداد ردیف‌های حذف شده
+
+    از هر گروه تکراری ردیفی که در keep_order (لیست عبارت‌های مرتب‌سازی) اول است
+    نگه داشته می‌شود، کلیدهای خارجی همه جداول metadata که به ردیف‌های حذفی اشاره
+    دارند به ردیف نگه داشته شده منتقل و بقیه حذف می‌شوند.
+    """
+    keys = [table.c[name] for name in key_columns]
+    primary_key = table.primary_key.columns.values()[0]
+    duplicated = select(*keys).group_by(*keys).having(func.count() > 1).subquery()
+    rows = conn.execute(
+        select(primary_key, *keys)
+        .where(tuple_(*keys).in_(select(*duplicated.c)))
+        .order_by(*keys, *keep_order)
+    ).all()
+
+    replacements = {}
+    keeper = {}
+    for row in rows:
+        key = tuple(row[1:])
+        if key in keeper:
+            replacements[row[0]] = keeper[key]
+        else:
+            keeper[key] = row[0]
+    if not replacements:
+        return 0
+
+    references = [
+        (other, foreign_key.parent)
+        for other in table.metadata.sorted_tables
+        for foreign_key in other.foreign_keys
+        if foreign_key.column is primary_key
+    ]
+    removed = list(replacements.items())
+    for i in range(0, len(removed), batch_size):
+        batch = removed[i:i + batch_size]
+        for other, column in references:
+            for old_id, new_id in batch:
+                conn.execute(update(other).where(column == old_id).values({column.name: new_id}))
+        conn.execute(delete(table).where(primary_key.in_([old_id for old_id, _ in batch])))
+    return len(removed)
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+
+
+class SellerStatsStore:
+    """شمارنده‌های خلاصه هر فروشنده در جدول seller_stats
+
+    شمارنده‌ها در همان تراکنش عملیات اصلی (فروش، تخصیص اکانت، تسویه کمیسیون)
+    به صورت افزایشی به‌روز می‌شوند تا داشبورد فقط یک خواندن با کلید اصلی باشد.
+    """
+
+    COUNTERS = ('total_accounts', 'available_accounts', 'total_sales', 'commission_balance', 'today_sales')
+
+    def __init__(self, stats, accounts, transactions, commission_balances):
+        self.stats = stats
+        self.accounts = accounts
+        self.transactions = transactions
+        self.commission_balances = commission_balances
+
+    def _update(self, session, seller_id, values):
+        """UPDATE افزایشی؛ اگر ردیف فروشنده وجود نداشت از روی جداول اصلی ساخته می‌شود
+
+        باید بعد از اعمال تغییرات جداول اصلی در همان تراکنش صدا زده شود تا در
+        حالت ساخت مجدد، تغییر فعلی دو بار شمرده نشود.
+        """
+        values['updated_at'] = datetime.utcnow()
+        result = session.execute(
+            update(self.stats).where(self.stats.c.seller_id == seller_id).values(**values)
+        )
+        if result.rowcount == 0:
+            session.flush()
+            self.rebuild(session, seller_id)
+
+    def increment(self, session, seller_id, **deltas):
+        """افزودن مقادیر به شمارنده‌های یک فروشنده"""
+        deltas = {name: value for name, value in deltas.items() if value}
+        if seller_id is None or not deltas:
+            return
+        self._update(session, seller_id, {name: self.stats.c[name] + value for name, value in deltas.items()})
+
+    def record_sales(self, session, seller_id, count, commission_amount, account_changes=()):
+        """ثبت فروش: تعداد کل، فروش امروز (با شروع مجدد در روز جدید) و مانده کمیسیون
+
+        account_changes: تغییرات اکانت‌های همین فروش (مثل record_account_changes) تا برای
+        هر فروشنده فقط یک UPDATE اجرا شود؛ دو UPDATE جدا در صورت ساخت مجدد ردیف در
+        اولی، فروش را دو بار می‌شمرد.
+        """
+        deltas = self._account_deltas(account_changes)
+        seller_deltas = deltas.pop(seller_id, {})
+        for other_seller, other_deltas in deltas.items():
+            self.increment(session, other_seller, **other_deltas)
+
+        today = datetime.utcnow().date()
+        values = {name: self.stats.c[name] + value for name, value in seller_deltas.items() if value}
+        values.update({
+            'total_sales': self.stats.c.total_sales + count,
+            'commission_balance': self.stats.c.commission_balance + commission_amount,
+            'today_sales': case(
+                (self.stats.c.sales_date == today, self.stats.c.today_sales + count),
+                else_=count
+            ),
+            'sales_date': today
+        })
+        self._update(session, seller_id, values)
+
+    def record_account_changes(self, session, changes):
+        """ثبت تغییر مالک/وضعیت اکانت‌ها
+
+        changes: لیست ((seller_id قبلی، وضعیت قبلی), (seller_id جدید، وضعیت جدید))
+        """
+        for seller_id, seller_deltas in self._account_deltas(changes).items():
+            self.increment(session, seller_id, **seller_deltas)
+
+    def _account_deltas(self, changes):
+        """تغییر شمارنده‌های اکانت هر فروشنده از روی لیست changes"""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for (old_seller, old_status), (new_seller, new_status) in changes:
+            if old_seller is not None:
+                deltas[old_seller]['total_accounts'] -= 1
+                deltas[old_seller]['available_accounts'] -= old_status == 'active'
+            if new_seller is not None:
+                deltas[new_seller]['total_accounts'] += 1
+                deltas[new_seller]['available_accounts'] += new_status == 'active'
+        return deltas
+
+    def get(self, session, seller_id):
+        """خواندن آمار فروشنده با یک کوئری کلید اصلی"""
+        row = session.execute(select(self.stats).where(self.stats.c.seller_id == seller_id)).first()
+        if row is None:
+            self.rebuild(session, seller_id)
+            session.commit()
+            row = session.execute(select(self.stats).where(self.stats.c.seller_id == seller_id)).first()
+
+        result = {name: row._mapping[name] or 0 for name in self.COUNTERS}
+        if row._mapping['sales_date'] != datetime.utcnow().date():
+            result['today_sales'] = 0
+        return result
+
+    def rebuild(self, session, seller_id=None):
+        """محاسبه دوباره آمار از جداول اصلی (برای همه فروشندگان یا یک فروشنده)"""
+        today = datetime.utcnow().date()
+        start_of_today = datetime.combine(today, datetime.min.time())
+        accounts, transactions, balances = self.accounts, self.transactions, self.commission_balances
+
+        def grouped(statement, column):
+            if seller_id is not None:
+                statement = statement.where(column == seller_id)
+            return dict(session.execute(statement.group_by(column)).all())
+
+        total_accounts = grouped(
+            select(accounts.c.seller_id, func.count()).where(accounts.c.seller_id.isnot(None)),
+            accounts.c.seller_id
+        )
+        available_accounts = grouped(
+            select(accounts.c.seller_id, func.count()).where(accounts.c.status == 'active'),
+            accounts.c.seller_id
+        )
+        total_sales = grouped(select(transactions.c.seller_id, func.count()), transactions.c.seller_id)
+        today_sales = grouped(
+            select(transactions.c.seller_id, func.count()).where(transactions.c.created_at >= start_of_today),
+            transactions.c.seller_id
+        )
+        # مانده از سر دفتر کمیسیون (commission_balances)
+        commission_balance = grouped(
+            select(balances.c.seller_id, func.sum(balances.c.balance)),
+            balances.c.seller_id
+        )
+
+        seller_ids = set(total_accounts) | set(total_sales) | set(commission_balance)
+        if seller_id is not None:
+            seller_ids = {seller_id}
+        seller_ids.discard(None)
+
+        statement = delete(self.stats)
+        if seller_id is not None:
+            statement = statement.where(self.stats.c.seller_id == seller_id)
+        session.execute(statement)
+
+        rows = [{
+            'seller_id': sid,
+            'total_accounts': total_accounts.get(sid, 0),
+            'available_accounts': available_accounts.get(sid, 0),
+            'total_sales': total_sales.get(sid, 0),
+            'commission_balance': commission_balance.get(sid) or 0,
+            'today_sales': today_sales.get(sid, 0),
+            'sales_date': today,
+            'updated_at': datetime.utcnow()
+        } for sid in seller_ids]
+        if rows:
+            session.execute(insert(self.stats), rows)
+        return len(rows)
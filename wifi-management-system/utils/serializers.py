@@ -0,0 +1,139 @@
+import json
+import time
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import String, select, type_coerce
+
+try:
+    import orjson
+except ImportError:  # orjson اختیاری است
+    orjson = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider Flask با orjson (خروجی UTF-8 بدون escape فارسی)
+
+    date و datetime مثل provider پیش‌فرض Flask (به صورت RFC 822 با http_date) سریال
+    می‌شوند، نه ISO 8601 خود orjson، تا خروجی endpointهای موجود تغییر نکند.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        # آرگومان‌های خاص json استاندارد (مثل indent) با پیاده‌سازی پیش‌فرض
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option),
+            mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    """استفاده از orjson برای jsonify در صورت نصب بودن"""
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+    return app.json
+
+
+def format_date(value):
+    """'%Y/%m/%d' - مقدار خام SQLite ('YYYY-MM-DD ...') بدون ساخت datetime برش داده می‌شود"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:10].replace('-', '/')
+    return value.strftime('%Y/%m/%d')
+
+
+def format_datetime(value):
+    """'%Y-%m-%d %H:%M:%S'"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value[:19]
+    if isinstance(value, datetime):
+        return value.isoformat(' ', 'seconds')
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ColumnSerializer:
+    """سریال‌سازی سریع لیست‌ها بدون ساخت نمونه‌های ORM
+
+    فقط ستون‌های لازم با Core انتخاب می‌شوند. ستون‌های تاریخ به صورت رشته خام
+    خوانده می‌شوند (type_coerce) و فرمت‌کننده فقط آن را برش می‌دهد.
+    fields: لیست (کلید خروجی، ستون) یا (کلید خروجی، ستون، فرمت‌کننده)
+    """
+
+    def __init__(self, fields):
+        self.keys = []
+        self.columns = []
+        self.formatters = []
+        for field in fields:
+            key, column = field[0], field[1]
+            formatter = field[2] if len(field) > 2 else None
+            if formatter is not None:
+                column = type_coerce(column, String)
+                self.formatters.append((len(self.keys), formatter))
+            self.keys.append(key)
+            self.columns.append(column.label(key))
+
+    def select(self):
+        """دستور select فقط با ستون‌های خروجی"""
+        return select(*self.columns)
+
+    def serialize(self, row):
+        values = list(row)
+        for index, formatter in self.formatters:
+            values[index] = formatter(values[index])
+        return dict(zip(self.keys, values))
+
+    def serialize_all(self, rows):
+        return [self.serialize(row) for row in rows]
+
+
+def benchmark_serialization(session, model, serializer, limit=None, repeat=3):
+    """بنچمارک ردیف در ثانیه: ORM + to_dict + json در مقابل ستون‌های Core + orjson؛ خروجی: {مسیر: ردیف در ثانیه}"""
+    def orm_path():
+        query = session.query(model)
+        if limit:
+            query = query.limit(limit)
+        rows = [obj.to_dict() for obj in query.all()]
+        json.dumps(rows, ensure_ascii=False)
+        session.expunge_all()
+        return len(rows)
+
+    def fast_path():
+        statement = serializer.select()
+        if limit:
+            statement = statement.limit(limit)
+        rows = serializer.serialize_all(session.execute(statement))
+        if orjson is not None:
+            orjson.dumps(rows)
+        else:
+            json.dumps(rows, ensure_ascii=False)
+        return len(rows)
+
+    results = {}
+    for name, path in (('orm', orm_path), ('core', fast_path)):
+        best = None
+        count = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = path()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = round(count / best) if best > 0 else 0
+
+    if results['orm']:
+        results['speedup'] = round(results['core'] / results['orm'], 2)
+    return results
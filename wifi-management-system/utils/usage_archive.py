@@ -0,0 +1,289 @@
+import os
+import re
+import struct
+import time
+import zipfile
+from datetime import date
+
+import numpy as np
+from sqlalchemy import and_, delete, func, select
+
+from utils.usage_partitions import month_start, next_month
+
+# ستون‌های بایگانی و نوع آن‌ها؛ hour_of_day نامعلوم به صورت -1 ذخیره می‌شود
+ARCHIVE_COLUMNS = {
+    'account_id': np.int32,
+    'date': 'datetime64[D]',
+    'hour_of_day': np.int8,
+    'data_used': np.float64,
+    'time_used': np.int32,
+}
+
+
+def to_arrays(rows, columns):
+    """تبدیل ردیف‌های (به ترتیب columns) به آرایه‌های NumPy هر ستون"""
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for name, column in zip(columns, values):
+        if name == 'hour_of_day':
+            column = [-1 if hour is None else hour for hour in column]
+        arrays[name] = np.array(column, dtype=ARCHIVE_COLUMNS[name])
+    return arrays
+
+
+def concat(parts, columns):
+    """چسباندن آرایه‌های چند بخش ستون به ستون"""
+    return {
+        name: np.concatenate([part[name] for part in parts]) if parts
+        else np.empty(0, dtype=ARCHIVE_COLUMNS[name])
+        for name in columns
+    }
+
+
+def group_sum(keys, values):
+    """جمع values به تفکیک یک یا چند آرایه کلید؛ خروجی: {کلید یا tuple کلیدها: جمع}"""
+    if len(values) == 0:
+        return {}
+    # کد هر کلید جداگانه و سپس یک کد ترکیبی برای گروه
+    uniques, codes = zip(*(np.unique(key, return_inverse=True) for key in keys))
+    shape = [len(unique) for unique in uniques]
+    combined = np.ravel_multi_index([code.ravel() for code in codes], shape)
+    present, inverse = np.unique(combined, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=values, minlength=len(present))
+    indexes = np.unravel_index(present, shape)
+    labels = [unique[index].tolist() for unique, index in zip(uniques, indexes)]
+    labels = labels[0] if len(keys) == 1 else list(zip(*labels))
+    return dict(zip(labels, sums.tolist()))
+
+
+class UsageArchive:
+    """بایگانی ستونی لاگ‌های مصرف سرد در فایل‌های ماهانه NumPy (.npz)
+
+    هر منبع بایگانی شده یک فایل {prefix}_YYYYMM.{source}.npz با یک آرایه برای هر
+    ستون ARCHIVE_COLUMNS دارد (فایل‌های قدیمی {prefix}_YYYYMM.npz هم خوانده می‌شوند)
+    و خواندن یک ماه همه فایل‌های آن را کنار هم می‌گذارد. هر فایل با جایگزینی کامل
+    نوشته می‌شود، نه ادغام، پس اجرای دوباره بایگانی همان منبع ردیفی را تکرار نمی‌کند.
+    با compress=False عضوهای zip فشرده نمی‌شوند و هنگام خواندن مستقیم memory-map
+    می‌شوند؛ با compress=True حجم کمتر است ولی هر ستون لازم هنگام خواندن از حالت
+    فشرده خارج می‌شود (عضو فشرده zip قابل memory-map نیست).
+    """
+
+    def __init__(self, directory, prefix='usage_logs', compress=True):
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self._pattern = re.compile(rf'^{re.escape(prefix)}_(\d{{4}})(\d{{2}})(\.[\w-]+)?\.npz$')
+
+    def path_for(self, month, source=None):
+        suffix = f'.{source}' if source else ''
+        return os.path.join(self.directory, f'{self.prefix}_{month.year:04d}{month.month:02d}{suffix}.npz')
+
+    def files(self, start=None, end=None):
+        """فایل‌های بایگانی ماه‌هایی که با بازه [start, end] هم‌پوشانی دارند: [(ماه، مسیر)]"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for name in os.listdir(self.directory):
+            match = self._pattern.match(name)
+            if match:
+                month = date(int(match.group(1)), int(match.group(2)), 1)
+                if (start is None or next_month(month) > start) and (end is None or month <= end):
+                    files.append((month, os.path.join(self.directory, name)))
+        return sorted(files)
+
+    def months(self, start=None, end=None):
+        """ماه‌های بایگانی شده که با بازه [start, end] هم‌پوشانی دارند"""
+        return sorted({month for month, _ in self.files(start, end)})
+
+    def _read_member(self, archive, path, name):
+        """یک ستون از فایل؛ عضو فشرده نشده به صورت memory-map باز می‌شود"""
+        info = archive.getinfo(f'{name}.npy')
+        if info.compress_type != zipfile.ZIP_STORED:
+            with archive.open(info) as f:
+                return np.lib.format.read_array(f)
+        with open(path, 'rb') as f:
+            # هدر محلی zip: ۳۰ بایت ثابت، سپس نام فایل و فیلد اضافه
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if not shape or shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+
+    def _load_file(self, path, columns):
+        with zipfile.ZipFile(path) as archive:
+            return {name: self._read_member(archive, path, name) for name in columns}
+
+    def load(self, month, columns=None):
+        """ستون‌های columns بایگانی یک ماه (همه منابع)؛ خروجی: {نام: آرایه}"""
+        columns = list(columns or ARCHIVE_COLUMNS)
+        parts = [self._load_file(path, columns) for _, path in self.files(month, month)]
+        # یک فایل: آرایه‌ها همان memory-map بدون کپی می‌مانند
+        return parts[0] if len(parts) == 1 else concat(parts, columns)
+
+    def write(self, month, arrays, source):
+        """نوشتن ردیف‌های یک منبع در فایل (month, source)؛ فایل قبلی همان منبع جایگزین می‌شود
+
+        خروجی: تعداد ردیف‌ها
+        """
+        path = self.path_for(month, source)
+        os.makedirs(self.directory, exist_ok=True)
+        # نوشتن در فایل موقت و جایگزینی اتمیک تا خواننده‌ها فایل نیمه‌کاره نبینند
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            (np.savez_compressed if self.compress else np.savez)(f, **arrays)
+        os.replace(temporary, path)
+        return len(arrays['account_id'])
+
+    def scan(self, start, end, columns=None, account_ids=None):
+        """ستون‌های بایگانی در بازه [start, end] (و در صورت نیاز فقط اکانت‌های account_ids)"""
+        columns = list(columns or ARCHIVE_COLUMNS)
+        needed = list(dict.fromkeys(columns + ['date'] + (['account_id'] if account_ids is not None else [])))
+        low, high = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        parts = []
+        for month in self.months(start, end):
+            arrays = self.load(month, needed)
+            mask = (arrays['date'] >= low) & (arrays['date'] <= high)
+            if account_ids is not None:
+                mask &= np.isin(arrays['account_id'], np.asarray(list(account_ids), dtype=np.int64))
+            parts.append({name: arrays[name][mask] for name in columns})
+        return concat(parts, columns)
+
+    def export(self, session, table, where=None, batch_size=100000):
+        """خواندن جریانی ردیف‌های table به آرایه‌های هر ماه؛ خروجی: {ماه: آرایه‌ها}"""
+        columns = list(ARCHIVE_COLUMNS)
+        statement = select(*[table.c[name] for name in columns])
+        if where is not None:
+            statement = statement.where(where)
+        parts = {}
+        result = session.execute(statement.execution_options(yield_per=batch_size))
+        for rows in result.partitions(batch_size):
+            arrays = to_arrays(rows, columns)
+            months = arrays['date'].astype('datetime64[M]')
+            for month in np.unique(months):
+                mask = months == month
+                parts.setdefault(month.item(), []).append({name: arrays[name][mask] for name in columns})
+        return {month_start(month): concat(chunks, columns) for month, chunks in parts.items()}
+
+    def archive(self, session, partitions, cutoff, batch_size=10000):
+        """انتقال لاگ‌های قبل از cutoff به بایگانی (با commit)
+
+        هر پارتیشنی که کامل قبل از cutoff است در فایل‌های منبع نام جدولش نوشته و
+        سپس DROP می‌شود. ردیف‌های قدیمی جدول اصلی دسته به دسته (به ترتیب id) در
+        فایل‌هایی به نام کوچک‌ترین id دسته نوشته و همان ردیف‌ها حذف می‌شوند. اجرای
+        دوباره بعد از خطا یا اجرای همزمان همان فایل‌ها را با همان ردیف‌ها (یا بیشتر)
+        بازنویسی می‌کند و چیزی دو بار بایگانی نمی‌شود.
+        خروجی: (نام پارتیشن‌های بایگانی شده، تعداد ردیف‌ها)
+        """
+        archived, rows = [], 0
+        for month, table in partitions.partitions(session, end=cutoff):
+            if next_month(month) > cutoff:
+                continue
+            for data_month, arrays in self.export(session, table).items():
+                rows += self.write(data_month, arrays, table.name)
+            partitions.drop(session, table)
+            session.commit()
+            archived.append(table.name)
+
+        template = partitions.template
+        while True:
+            ids = session.execute(
+                select(template.c.id).where(template.c.date < cutoff).order_by(template.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            source = f'{template.name}-{ids[0]}'
+            batch = and_(template.c.id.between(ids[0], ids[-1]), template.c.date < cutoff)
+            for data_month, arrays in self.export(session, template, batch).items():
+                rows += self.write(data_month, arrays, source)
+            session.execute(delete(template).where(batch))
+            session.commit()
+            if len(ids) < batch_size:
+                break
+        return archived, rows
+
+
+    def drop_before(self, cutoff):
+        """حذف فایل‌های ماه‌هایی که کامل قبل از cutoff هستند؛ خروجی: نام فایل‌های حذف شده"""
+        dropped = []
+        for month, path in self.files(end=cutoff):
+            if next_month(month) <= cutoff:
+                os.remove(path)
+                dropped.append(os.path.basename(path))
+        return dropped
+
+
+class UsageLogReader:
+    """خواندن یکپارچه لاگ‌های مصرف گرم (دیتابیس) و سرد (بایگانی) به صورت آرایه‌های NumPy"""
+
+    def __init__(self, partitions, archive):
+        self.partitions = partitions
+        self.archive = archive
+
+    def columns(self, session, start, end, columns=None, account_ids=None):
+        """ستون‌های لاگ‌های بازه [start, end] از هر دو منبع؛ خروجی: {نام: آرایه}"""
+        columns = list(columns or ARCHIVE_COLUMNS)
+        where = None
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            where = lambda table: table.c.account_id.in_(account_ids)
+        rows = self.partitions.execute(
+            session, lambda: session.execute(self.partitions.select(session, columns, start, end, where=where)).all()
+        )
+        hot = to_arrays(rows, columns)
+        cold = self.archive.scan(start, end, columns, account_ids)
+        return concat([cold, hot], columns)
+
+    def sum(self, session, start, end, by=(), column='data_used', account_ids=None):
+        """جمع column به تفکیک ستون‌های by (خالی یعنی جمع کل)
+
+        بخش سرد با NumPy روی بایگانی و بخش گرم با GROUP BY در دیتابیس جمع زده
+        می‌شود تا ردیف‌های خام گرم به پایتون منتقل نشوند.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        cold = self.archive.scan(start, end, by + [column], account_ids)
+        values = cold[column].astype(np.float64)
+
+        where = None
+        if account_ids is not None:
+            account_ids = list(account_ids)
+            where = lambda table: table.c.account_id.in_(account_ids)
+
+        def read_hot():
+            logs = self.partitions.select(session, by + [column], start, end, where=where).subquery()
+            keys = [logs.c[name] for name in by]
+            return session.execute(select(*keys, func.sum(logs.c[column])).group_by(*keys)).all()
+
+        hot = self.partitions.execute(session, read_hot)
+
+        if not by:
+            return float(values.sum()) + float(hot[0][0] or 0)
+        totals = group_sum([cold[name] for name in by], values)
+        for row in hot:
+            # همان نمایش بایگانی: ساعت نامعلوم -1
+            key = tuple(-1 if name == 'hour_of_day' and value is None else value for name, value in zip(by, row))
+            key = key[0] if len(by) == 1 else key
+            totals[key] = totals.get(key, 0.0) + float(row[-1])
+        return totals
+
+
+def benchmark_archive_scan(session, reader, start, end, repeat=5):
+    """زمان جمع مصرف به تفکیک اکانت و روز: بایگانی ستونی در برابر GROUP BY روی دیتابیس
+
+    اول روی داده‌های گرم و بعد از بایگانی همان بازه اجرا شود تا دو عدد مقایسه شوند.
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = reader.sum(session, start, end, by=('account_id', 'date'))
+    return {
+        'groups': len(result),
+        'archived_months': len(reader.archive.months(start, end)),
+        'ms': round((time.perf_counter() - started) / repeat * 1000, 2)
+    }
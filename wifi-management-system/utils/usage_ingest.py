@@ -0,0 +1,173 @@
+import csv
+import gzip
+import io
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson اختیاری است
+    _loads = json.loads
+
+# نام‌های قابل قبول ستون‌ها در ورودی
+ACCOUNT_FIELDS = ('account_id', 'account', 'username')
+FIELDS = ('data_used', 'time_used', 'timestamp')
+# ترتیب مقادیر ردیف‌های خروجی parser (ستون‌های usage_logs)
+COLUMNS = ('account_id', 'data_used', 'time_used', 'hour_of_day', 'date', 'created_at')
+
+
+def parse_timestamp(value):
+    """زمان رکورد: ISO 8601 (با فاصله یا T) یا epoch بر حسب ثانیه"""
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.utcfromtimestamp(float(value))
+
+
+def open_text_stream(stream, gzipped=False):
+    """باز کردن یک stream باینری (در صورت نیاز gzip) به صورت متنی بدون خواندن کامل آن"""
+    if gzipped:
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+
+class UsageLogParser:
+    """تبدیل تدریجی رکوردهای مصرف (CSV یا NDJSON) به ردیف‌های tuple به ترتیب COLUMNS
+
+    ستون اکانت می‌تواند account_id عددی یا نام کاربری (account/username) باشد که با
+    یک cache در حافظه به id تبدیل می‌شود؛ نوع مقدار از نام ستون تعیین می‌شود، پس نام
+    کاربری عددی (مثل ووچرهای عددی) با id اشتباه نمی‌شود. رکوردهای نامعتبر رد و شمرده می‌شوند.
+    """
+
+    max_errors = 10
+
+    def __init__(self, session=None, accounts=None):
+        self.session = session
+        self.accounts = accounts
+        self.rejected = 0
+        self.errors = []
+        self._account_ids = {}
+        self._known_ids = None
+        self._dates = {}
+        self.created_at = datetime.utcnow()
+
+    def _reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f'line {line}: {message}')
+
+    def _check_id(self, account_id):
+        """بررسی وجود account_id با مجموعه idهای اکانت که یک بار بارگذاری می‌شود"""
+        if self.session is None or self.accounts is None:
+            return account_id
+        if self._known_ids is None:
+            self._known_ids = set(self.session.execute(select(self.accounts.c.id)).scalars())
+        return account_id if account_id in self._known_ids else None
+
+    def _resolve(self, field, account):
+        """account_id از مقدار ستون اکانت: id برای ستون account_id و نام کاربری برای بقیه"""
+        if field == 'account_id':
+            return self._check_id(int(account))
+        account = str(account).strip()
+        if account not in self._account_ids:
+            account_id = None
+            if self.session is not None and self.accounts is not None:
+                account_id = self.session.execute(
+                    select(self.accounts.c.id).where(self.accounts.c.username == account).limit(1)
+                ).scalar()
+            self._account_ids[account] = account_id
+        return self._account_ids[account]
+
+    def _row(self, field, account, data_used, time_used, timestamp):
+        account_id = self._resolve(field, account)
+        if account_id is None:
+            raise ValueError(f'unknown account {account!r}')
+        moment = parse_timestamp(timestamp)
+        # یک شیء date برای هر روز، به جای ساختن آن برای هر رکورد
+        day = moment.toordinal()
+        date = self._dates.get(day)
+        if date is None:
+            date = self._dates[day] = moment.date()
+        return account_id, float(data_used), int(float(time_used)), moment.hour, date, self.created_at
+
+    def parse_csv(self, text):
+        """CSV با سطر عنوان؛ ترتیب ستون‌ها از روی عنوان‌ها تعیین می‌شود"""
+        reader = csv.reader(text)
+        header = [name.strip().lower() for name in next(reader, [])]
+        try:
+            field = next(name for name in ACCOUNT_FIELDS if name in header)
+            account_index = header.index(field)
+            indexes = [header.index(name) for name in FIELDS]
+        except (StopIteration, ValueError):
+            raise ValueError(f'CSV header must contain one of {ACCOUNT_FIELDS} and {FIELDS}')
+
+        data_index, time_index, timestamp_index = indexes
+        for line, record in enumerate(reader, start=2):
+            if not record:
+                continue
+            try:
+                yield self._row(field, record[account_index], record[data_index], record[time_index], record[timestamp_index])
+            except (IndexError, TypeError, ValueError, OverflowError) as e:
+                self._reject(line, e)
+
+    def parse_ndjson(self, text):
+        """هر خط یک شیء JSON"""
+        for line, raw in enumerate(text, start=1):
+            if not raw.strip():
+                continue
+            try:
+                record = _loads(raw)
+                field = next((name for name in ACCOUNT_FIELDS if name in record), None)
+                if field is None:
+                    raise ValueError(f'missing one of {ACCOUNT_FIELDS}')
+                yield self._row(field, record[field], record['data_used'], record['time_used'], record['timestamp'])
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                self._reject(line, e)
+
+    def parse(self, text, fmt):
+        if fmt == 'csv':
+            return self.parse_csv(text)
+        if fmt == 'ndjson':
+            return self.parse_ndjson(text)
+        raise ValueError(f'unsupported format {fmt!r}')
+
+
+def benchmark_usage_ingest(inserter, account_ids, rows=200000, fmt='csv'):
+    """سرعت ورود رکوردهای مصرف ساختگی (gzip در حافظه) از parse تا درج
+
+    ردیف‌های درج شده در جدول باقی می‌مانند؛ روی دیتابیس آزمایشی اجرا شود.
+    """
+    start_time = datetime(2024, 1, 1)
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as gz:
+        text = io.TextIOWrapper(gz, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            text.write('account_id,data_used,time_used,timestamp\n')
+        for i in range(rows):
+            moment = (start_time + timedelta(seconds=i * 7)).isoformat(sep=' ')
+            account_id = random.choice(account_ids)
+            data_used = round(random.random() * 50, 2)
+            if fmt == 'csv':
+                text.write(f'{account_id},{data_used},{i % 60},{moment}\n')
+            else:
+                text.write(json.dumps({
+                    'account_id': account_id, 'data_used': data_used, 'time_used': i % 60, 'timestamp': moment
+                }) + '\n')
+        text.flush()
+        text.detach()
+    buffer.seek(0)
+
+    parser = UsageLogParser()
+    start = time.perf_counter()
+    stats = inserter.insert_tuples(COLUMNS, parser.parse(open_text_stream(buffer, gzipped=True), fmt))
+    elapsed = time.perf_counter() - start
+    stats['rejected'] = parser.rejected
+    stats['end_to_end_rows_per_sec'] = round(stats['rows'] / elapsed) if elapsed > 0 else 0
+    return stats
@@ -0,0 +1,188 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import date
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, inspect, select, union_all
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+def _connection(session):
+    """Connection زیر یک Session (یا خود Connection)"""
+    return session.connection() if hasattr(session, 'get_bind') else session
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+class UsageLogPartitions:
+    """لاگ‌های مصرف تقسیم شده بر اساس ماه در جداول جدا ({prefix}_YYYYMM)
+
+    جدول اصلی (template) الگوی ستون‌هاست و همچنان برای لاگ‌های قدیمی و نوشتن‌های
+    ORM خوانده می‌شود. ورود دسته‌ای هر ردیف را بر اساس ستون date به جدول ماه خودش
+    می‌فرستد، خواندن فقط جداول ماه‌های داخل بازه را با UNION ALL ترکیب می‌کند و
+    نگهداری (retention) کل جدول یک ماه را با DROP TABLE حذف می‌کند، بدون DELETE
+    ردیف به ردیف. فهرست جداول هر refresh_interval ثانیه از دیتابیس خوانده می‌شود
+    تا پارتیشن‌های ساخته یا حذف شده در پروسس‌های دیگر هم دیده شوند؛ کوئری‌هایی که
+    از طریق execute اجرا می‌شوند اگر به پارتیشن حذف شده‌ای برخورد کنند فهرست را
+    فوراً دوباره می‌خوانند.
+    """
+
+    def __init__(self, template, prefix=None, refresh_interval=60):
+        self.template = template
+        self.prefix = prefix or template.name
+        self.refresh_interval = refresh_interval
+        self.metadata = MetaData()
+        self._tables = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._pattern = re.compile(rf'^{re.escape(self.prefix)}_(\d{{4}})(\d{{2}})$')
+
+    def name_for(self, month):
+        return f'{self.prefix}_{month.year:04d}{month.month:02d}'
+
+    def _define(self, month):
+        """تعریف Table پارتیشن یک ماه (بدون ساختن آن در دیتابیس)"""
+        table = self._tables.get(month)
+        if table is None:
+            name = self.name_for(month)
+            table = self.metadata.tables.get(name)
+            if table is None:
+                table = Table(
+                    name, self.metadata,
+                    *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+                      for column in self.template.columns],
+                    Index(f'idx_{name}_account_date', 'account_id', 'date')
+                )
+            self._tables[month] = table
+        return table
+
+    def refresh(self, session):
+        """خواندن دوباره فهرست پارتیشن‌های موجود از دیتابیس"""
+        names = inspect(_connection(session)).get_table_names()
+        with self._lock:
+            months = set()
+            for name in names:
+                match = self._pattern.match(name)
+                if match:
+                    month = date(int(match.group(1)), int(match.group(2)), 1)
+                    months.add(month)
+                    self._define(month)
+            for month in set(self._tables) - months:
+                self._tables.pop(month)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.refresh(session)
+
+    def execute(self, session, build):
+        """اجرای build() که روی پارتیشن‌ها کوئری می‌زند؛ خروجی: نتیجه build
+
+        اگر پروسس دیگری پارتیشنی را که هنوز در فهرست این پروسس است حذف کرده باشد
+        کوئری خطا می‌دهد؛ در این حالت فهرست دوباره خوانده و build یک بار دیگر با
+        جداول موجود اجرا می‌شود. build باید جداول را خودش از sources/select بگیرد.
+        """
+        with self._lock:
+            known = set(self._tables)
+        conn = _connection(session)
+        # در postgresql خطای یک دستور کل تراکنش را خراب می‌کند؛ تلاش اول داخل savepoint
+        guard = conn.begin_nested() if conn.dialect.name == 'postgresql' else nullcontext()
+        try:
+            with guard:
+                return build()
+        except DBAPIError:
+            self.refresh(session)
+            with self._lock:
+                if set(self._tables) == known:
+                    raise
+        return build()
+
+    def table_for(self, session, day):
+        """جدول پارتیشن ماه day؛ اگر وجود نداشته باشد ساخته می‌شود"""
+        self._ensure_loaded(session)
+        month = month_start(day)
+        table = self._tables.get(month)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._define(month)
+        conn = _connection(session)
+        conn.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        return table
+
+    def partitions(self, session, start=None, end=None):
+        """پارتیشن‌های موجود که با بازه [start, end] هم‌پوشانی دارند: [(ماه، Table)]"""
+        self._ensure_loaded(session)
+        return sorted(
+            (month, table) for month, table in list(self._tables.items())
+            if (start is None or next_month(month) > start) and (end is None or month <= end)
+        )
+
+    def sources(self, session, start=None, end=None):
+        """همه جداولی که باید برای بازه خوانده شوند: جدول اصلی و پارتیشن‌های بازه"""
+        return [self.template] + [table for _, table in self.partitions(session, start, end)]
+
+    def select(self, session, columns, start, end, where=None):
+        """SELECT ستون‌های columns از همه جداول بازه [start, end] با UNION ALL
+
+        where: تابعی که برای هر جدول شرط اضافه را می‌سازد (مثلاً lambda t: t.c.account_id == 5)
+        """
+        statements = []
+        for table in self.sources(session, start, end):
+            statement = select(*[table.c[name] for name in columns])\
+                .where(table.c.date >= start, table.c.date <= end)
+            if where is not None:
+                statement = statement.where(where(table))
+            statements.append(statement)
+        return statements[0] if len(statements) == 1 else union_all(*statements)
+
+    def route(self, session, chunk, date_index):
+        """گروه‌بندی ردیف‌های tuple بر اساس جدول ماه (مقدار date در date_index)"""
+        groups = defaultdict(list)
+        for row in chunk:
+            groups[month_start(row[date_index])].append(row)
+        return [(self.table_for(session, month), rows) for month, rows in groups.items()]
+
+    def drop_before(self, session, cutoff):
+        """حذف پارتیشن‌هایی که کامل قبل از cutoff هستند با DROP TABLE
+
+        هزینه به تعداد ردیف‌های هر ماه بستگی ندارد. ماهی که cutoff وسط آن است نگه
+        داشته می‌شود. خروجی: نام جداول حذف شده
+        """
+        self.refresh(session)
+        dropped = []
+        for month, table in self.partitions(session):
+            if next_month(month) <= cutoff:
+                self.drop(session, table)
+                dropped.append(table.name)
+        return dropped
+
+    def drop(self, session, table):
+        """DROP TABLE یک پارتیشن و حذف آن از فهرست"""
+        table.drop(_connection(session), checkfirst=True)
+        with self._lock:
+            for month, known in list(self._tables.items()):
+                if known is table:
+                    self._tables.pop(month)
+            self.metadata.remove(table)
+
+    def purge_template(self, session, cutoff, batch_size=10000):
+        """حذف حداکثر batch_size ردیف قبل از cutoff از جدول اصلی؛ خروجی: تعداد حذف شده
+
+        commit به عهده فراخواننده است؛ برای کوتاه ماندن قفل‌ها تا وقتی خروجی برابر
+        batch_size است بعد از هر commit دوباره صدا زده شود.
+        """
+        template = self.template
+        batch = select(template.c.id).where(template.c.date < cutoff).limit(batch_size)
+        return session.execute(delete(template).where(template.c.id.in_(batch))).rowcount
@@ -0,0 +1,194 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+# ستون‌های جمع‌پذیر جداول خلاصه
+SUMS = ('data_used', 'time_used', 'records')
+
+
+class UsageRollup:
+    """خلاصه ساعتی و روزانه مصرف هر اکانت از روی usage_logs و پارتیشن‌های ماهانه آن
+
+    پیشرفت هر جدول لاگ با یک watermark (بزرگ‌ترین id خلاصه شده) در usage_rollup_state
+    نگهداری می‌شود و هر catch_up فقط لاگ‌های بعد از آن را با یک INSERT ... SELECT
+    گروه‌بندی شده به جداول خلاصه اضافه می‌کند (upsert افزایشی). ردیف state مثل سر
+    دفتر کمیسیون قفل می‌شود تا دو catch_up همزمان یک بازه را دو بار نشمرند.
+    ترتیب id لاگ‌ها با ترتیب commit یکی فرض شده است (در SQLite نوشتن‌ها سریال‌اند).
+    """
+
+    name = 'usage'
+
+    def __init__(self, partitions, hourly, daily, state):
+        self.partitions = partitions
+        self.hourly = hourly
+        self.daily = daily
+        self.state = state
+
+    def _state_name(self, logs):
+        """نام ردیف state هر جدول لاگ (جدول اصلی همان نام قبلی را نگه می‌دارد)"""
+        return self.name if logs is self.partitions.template else f'{self.name}:{logs.name}'
+
+    def _lock(self, session, name):
+        """قفل ردیف state و خواندن watermark"""
+        state = self.state
+        result = session.execute(
+            update(state).where(state.c.name == name).values(last_log_id=state.c.last_log_id)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(state).values(name=name, last_log_id=0, updated_at=datetime.utcnow()))
+            return 0
+        return session.execute(select(state.c.last_log_id).where(state.c.name == name)).scalar()
+
+    def _upsert(self, session, table, keys, source):
+        """افزودن نتایج source (ستون‌های keys و SUMS) به ردیف‌های table"""
+        columns = list(keys) + list(SUMS)
+        # Connection خودش dialect دارد و Session از طریق bind
+        dialect = (getattr(session, 'dialect', None) or session.get_bind().dialect).name
+        if dialect in ('sqlite', 'postgresql'):
+            module = sqlite if dialect == 'sqlite' else postgresql
+            statement = module.insert(table).from_select(columns, source)
+            statement = statement.on_conflict_do_update(
+                index_elements=list(keys),
+                set_={name: table.c[name] + statement.excluded[name] for name in SUMS}
+            )
+            session.execute(statement)
+        elif dialect == 'mysql':
+            statement = mysql.insert(table).from_select(columns, source)
+            session.execute(statement.on_duplicate_key_update(
+                {name: table.c[name] + statement.inserted[name] for name in SUMS}
+            ))
+        else:
+            # سایر دیتابیس‌ها: UPDATE هر کلید و INSERT در صورت نبودن
+            for row in session.execute(source).mappings().all():
+                condition = [table.c[key] == row[key] for key in keys]
+                result = session.execute(
+                    update(table).where(*condition).values({name: table.c[name] + row[name] for name in SUMS})
+                )
+                if result.rowcount == 0:
+                    session.execute(insert(table).values(dict(row)))
+
+    def _aggregate(self, logs, keys, lower, upper):
+        statement = select(
+            *keys,
+            func.sum(logs.c.data_used).label('data_used'),
+            func.sum(logs.c.time_used).label('time_used'),
+            func.count().label('records')
+        ).where(logs.c.id > lower, logs.c.id <= upper)
+        return statement, [key.key for key in keys]
+
+    def catch_up(self, session, batch_size=None):
+        """خلاصه کردن لاگ‌های جدید همه جداول (هر جدول حداکثر batch_size id)
+
+        session می‌تواند Session یا Connection باشد؛ commit به عهده فراخواننده است.
+        خروجی: تعداد لاگ‌های خلاصه شده
+        """
+        return self.partitions.execute(session, lambda: sum(
+            self._catch_up(session, logs, batch_size) for logs in self.partitions.sources(session)
+        ))
+
+    def _catch_up(self, session, logs, batch_size):
+        name = self._state_name(logs)
+        watermark = self._lock(session, name)
+        first, upper = session.execute(
+            select(func.min(logs.c.id), func.max(logs.c.id)).where(logs.c.id > watermark)
+        ).first()
+        if upper is None:
+            return 0
+        if batch_size:
+            # پنجره از اولین id خلاصه نشده شروع می‌شود تا فاصله‌های id دسته خالی نسازند
+            upper = min(upper, first + batch_size - 1)
+
+        count = session.execute(
+            select(func.count()).where(logs.c.id > watermark, logs.c.id <= upper)
+        ).scalar()
+
+        hour = logs.c.hour_of_day.label('hour')
+        source, keys = self._aggregate(logs, [logs.c.account_id, logs.c.date, hour], watermark, upper)
+        # لاگ بدون ساعت فقط در خلاصه روزانه حساب می‌شود
+        source = source.where(logs.c.hour_of_day.isnot(None)).group_by(logs.c.account_id, logs.c.date, logs.c.hour_of_day)
+        self._upsert(session, self.hourly, keys, source)
+
+        source, keys = self._aggregate(logs, [logs.c.account_id, logs.c.date], watermark, upper)
+        self._upsert(session, self.daily, keys, source.group_by(logs.c.account_id, logs.c.date))
+
+        session.execute(
+            update(self.state).where(self.state.c.name == name)
+            .values(last_log_id=upper, updated_at=datetime.utcnow())
+        )
+        return count
+
+    def forget(self, session, table_names):
+        """حذف watermark پارتیشن‌های حذف شده (خلاصه‌های آن‌ها باقی می‌مانند)"""
+        if table_names:
+            session.execute(delete(self.state).where(
+                self.state.c.name.in_([f'{self.name}:{name}' for name in table_names])
+            ))
+
+    def on_chunk(self, conn, chunk):
+        """hook درج دسته‌ای لاگ‌ها: خلاصه کردن همان دسته در تراکنش درج آن"""
+        self.catch_up(conn)
+
+    def lag(self, session):
+        """تعداد id لاگ‌های هنوز خلاصه نشده در همه جداول (برای پایش)"""
+        total = 0
+        for logs in self.partitions.sources(session):
+            watermark = session.execute(
+                select(self.state.c.last_log_id).where(self.state.c.name == self._state_name(logs))
+            ).scalar() or 0
+            upper = session.execute(select(func.max(logs.c.id))).scalar() or 0
+            total += max(0, upper - watermark)
+        return total
+
+    def daily_usage(self, session, account_id, start, end):
+        """مصرف روزانه اکانت در بازه [start, end]؛ خروجی: {date: (data_used, time_used)}"""
+        daily = self.daily
+        return {
+            row.date: (row.data_used, row.time_used)
+            for row in session.execute(
+                select(daily.c.date, daily.c.data_used, daily.c.time_used)
+                .where(daily.c.account_id == account_id, daily.c.date >= start, daily.c.date <= end)
+            )
+        }
+
+    def hourly_usage(self, session, account_id, start, end):
+        """جمع مصرف هر ساعت روز برای اکانت در بازه [start, end]؛ خروجی: {hour: data_used}"""
+        hourly = self.hourly
+        return dict(session.execute(
+            select(hourly.c.hour, func.sum(hourly.c.data_used))
+            .where(hourly.c.account_id == account_id, hourly.c.date >= start, hourly.c.date <= end)
+            .group_by(hourly.c.hour)
+        ).all())
+
+    def total_usage(self, session, account_id):
+        """مصرف کل اکانت (مگابایت، دقیقه) از خلاصه روزانه"""
+        daily = self.daily
+        row = session.execute(
+            select(func.coalesce(func.sum(daily.c.data_used), 0), func.coalesce(func.sum(daily.c.time_used), 0))
+            .where(daily.c.account_id == account_id)
+        ).first()
+        return row[0], row[1]
+
+
+def benchmark_rollup_reads(session, rollup, account_id, start, end, repeat=200):
+    """زمان خواندن نمودار مصرف از جداول خلاصه در برابر گروه‌بندی مستقیم لاگ‌های خام"""
+    def from_logs():
+        logs = rollup.partitions.select(
+            session, ['date', 'hour_of_day', 'data_used'], start, end,
+            where=lambda table: table.c.account_id == account_id
+        ).subquery()
+        session.execute(select(logs.c.date, func.sum(logs.c.data_used)).group_by(logs.c.date)).all()
+        session.execute(select(logs.c.hour_of_day, func.sum(logs.c.data_used)).group_by(logs.c.hour_of_day)).all()
+
+    def from_rollups():
+        rollup.daily_usage(session, account_id, start, end)
+        rollup.hourly_usage(session, account_id, start, end)
+
+    results = {}
+    for name, read in (('rollup', from_rollups), ('raw', from_logs)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            read()
+        results[f'{name}_ms'] = round((time.perf_counter() - started) / repeat * 1000, 3)
+    return results